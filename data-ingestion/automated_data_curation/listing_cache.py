@@ -0,0 +1,125 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# request headers that change the content of a CCDB listing, part of the cache key
+VALIDITY_HEADERS = ("If-Not-Before", "If-Not-After")
+
+
+class ListingCache:
+    """
+    On-disk cache of CCDB JSON listings (/latest, /browse), keyed by URL and the
+    validity headers of the request.
+
+    An entry younger than `ttl_s` is served without a request. An older one is
+    revalidated with If-None-Match / If-Modified-Since when the server gave an
+    ETag / Last-Modified, so an unchanged listing costs a 304 with no body.
+    Once the cache exceeds `max_bytes`, the least recently used entries are evicted
+    down to `low_water` * `max_bytes`, so the eviction does not run again on the next put.
+    """
+
+    def __init__(self, cache_dir: str, ttl_s: float = 300, max_bytes: int = 256 * 1024 * 1024,
+                 low_water: float = 0.8):
+        self.cache_dir = cache_dir
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.low_water_bytes = int(max_bytes * low_water)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "evicted": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # path -> size in LRU order (oldest first), the directory is only walked here;
+        # mtimes keep the order across processes (get() touches the file)
+        entries = sorted((os.stat(p).st_mtime_ns, p, os.path.getsize(p)) for p in self._entry_paths())
+        self.sizes = OrderedDict((p, size) for _, p, size in entries)
+        self.total_bytes = sum(self.sizes.values())
+
+    @staticmethod
+    def key(url: str, headers: Dict[str, str]) -> str:
+        validity = {h: str(headers[h]) for h in VALIDITY_HEADERS if h in headers}
+        return hashlib.sha256(json.dumps([url, validity], sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entry_paths(self):
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for fn in filenames:
+                if fn.endswith(".json"):
+                    yield os.path.join(dirpath, fn)
+
+    def get(self, url: str, headers: Dict[str, str]) -> Optional[Dict]:
+        """Cached entry {"fetched_at", "etag", "last_modified", "payload"} or None."""
+        path = self._path(self.key(url, headers))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self.lock:
+            if path in self.sizes:
+                self.sizes.move_to_end(path)
+        try:
+            os.utime(path)  # LRU order for the next process
+        except OSError:
+            pass  # evicted meanwhile
+        return entry
+
+    def count(self, stat: str):
+        """Increment one of the `stats` counters (hits, revalidated, misses), thread-safe."""
+        with self.lock:
+            self.stats[stat] += 1
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry["fetched_at"] < self.ttl_s
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, headers: Dict[str, str], payload, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> Dict:
+        entry = {"url": url, "fetched_at": time.time(), "etag": etag, "last_modified": last_modified, "payload": payload}
+        path = self._path(self.key(url, headers))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, separators=(",", ":"))
+
+        with self.lock:
+            new_size = os.path.getsize(tmp)
+            os.replace(tmp, path)
+            self.total_bytes += new_size - self.sizes.pop(path, 0)
+            self.sizes[path] = new_size
+            if self.total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return entry
+
+    def _evict(self, keep: str):
+        """Delete the least recently used entries down to the low-water mark. Called with the lock held."""
+        for p in list(self.sizes):
+            if self.total_bytes <= self.low_water_bytes:
+                break
+            if p == keep:
+                continue
+            size = self.sizes.pop(p)
+            try:
+                os.unlink(p)
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+            self.stats["evicted"] += 1
+        logger.info("Listing cache evicted down to %d bytes", self.total_bytes)
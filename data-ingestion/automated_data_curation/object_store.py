@@ -0,0 +1,81 @@
+import os
+import re
+import hashlib
+import tempfile
+import threading
+from typing import Iterable
+
+import requests
+
+
+_SAFE_ETAG = re.compile(r"^[A-Za-z0-9._-]+$")
+
+
+class ObjectStore:
+    """
+    Content-addressed store of QCDB/CCDB objects keyed by ETag:
+
+        <root>/<etag[:2]>/<etag>
+
+    Blobs are streamed to a temporary file in the same directory and renamed into
+    place, so an interrupted download never leaves a half-written blob. The usual
+    qc/TPC/MO/... tree is made of hardlinks (symlinks across filesystems) to the blobs,
+    so identical payloads are stored once and "already have it?" is one stat call.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def normalize_etag(etag: str) -> str:
+        etag = str(etag).strip().strip('"')
+        if not etag:
+            raise ValueError("Empty ETag")
+        # CCDB ETags are UUIDs, anything else is hashed into a safe file name
+        return etag if _SAFE_ETAG.match(etag) else hashlib.sha256(etag.encode()).hexdigest()
+
+    def blob_path(self, etag: str) -> str:
+        key = self.normalize_etag(etag)
+        return os.path.join(self.root, key[:2], key)
+
+    def has(self, etag: str) -> bool:
+        return os.path.isfile(self.blob_path(etag))
+
+    def put_stream(self, etag: str, chunks: Iterable[bytes]) -> str:
+        dst = self.blob_path(etag)
+        if os.path.isfile(dst):
+            return dst
+
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    if chunk:
+                        f.write(chunk)
+            os.replace(tmp, dst)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return dst
+
+    def put_response(self, etag: str, resp: requests.Response) -> str:
+        return self.put_stream(etag, resp.iter_content(chunk_size=1024 * 1024))
+
+    def link(self, etag: str, dst: str) -> str:
+        """Make `dst` point to the blob of `etag` (hardlink, else symlink), replacing what was there."""
+        src = self.blob_path(etag)
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        if os.path.isdir(dst):
+            raise IsADirectoryError(f"Refusing to write to directory path: {dst!r}")
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            return dst
+
+        tmp = f"{dst}.link-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.link(src, tmp)
+        except OSError:
+            os.symlink(os.path.abspath(src), tmp)
+        os.replace(tmp, dst)
+        return dst
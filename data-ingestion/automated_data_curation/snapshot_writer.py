@@ -0,0 +1,106 @@
+"""
+Partitioned snapshots of the bookkeeping records fetched by a sync:
+
+    <out_dir>/<dataset>/sync_id=<sync id>/fill_number=<fill>/part-00000.jsonl.gz
+                                                             part-00000.parquet   (format="parquet")
+
+Records are streamed page by page into gzip-compressed JSON Lines, so every sync keeps
+its own snapshot and readers can load only the fills / syncs they need (the key=value
+directories are understood by pyarrow/pandas).
+
+Parquet (needs pyarrow) cannot be appended to: the records are buffered and written on
+close(), one file per partition, all the partitions of a dataset with the same schema
+(inferred from all its records), so the dataset reads back as one table.
+"""
+import gzip
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Iterable
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMATS = ("jsonl", "parquet")
+
+
+class SnapshotWriter:
+    def __init__(self, out_dir: str, sync_id, fmt: str = "jsonl"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown snapshot format {fmt!r}, expected one of {FORMATS}")
+        if fmt == "parquet" and pa is None:
+            raise ImportError("pyarrow is not installed but the snapshot format is parquet")
+
+        self.out_dir = out_dir
+        self.sync_id = sync_id
+        self.fmt = fmt
+        self.buffers = defaultdict(lambda: defaultdict(list))  # parquet: dataset -> fill number -> records
+        self.sizes = {}  # path -> size, of the files written by this sync
+        self.bytes_written = 0
+
+    def partition_dir(self, dataset: str, fill_number) -> str:
+        fill = "unknown" if fill_number is None else fill_number
+        return os.path.join(self.out_dir, dataset, f"sync_id={self.sync_id}", f"fill_number={fill}")
+
+    def write(self, dataset: str, records: Iterable[Dict], fill_number_key: str = "fillNumber") -> Dict[str, int]:
+        """
+        Append `records` to the partitions of their fill number. Returns {"files", "bytes"}
+        written by this call (nothing for parquet, see close()).
+        """
+        by_fill = defaultdict(list)
+        for rec in records:
+            by_fill[rec.get(fill_number_key)].append(rec)
+
+        if self.fmt == "parquet":
+            for fill_number, recs in by_fill.items():
+                self.buffers[dataset][fill_number].extend(recs)
+            return {"files": 0, "bytes": 0}
+
+        paths = []
+        for fill_number, recs in by_fill.items():
+            part_dir = self.partition_dir(dataset, fill_number)
+            os.makedirs(part_dir, exist_ok=True)
+            paths.append(self._append_jsonl(part_dir, recs))
+        return self._account(paths)
+
+    def close(self) -> Dict[str, int]:
+        """Write the buffered parquet partitions. Returns {"files", "bytes"} written by this call."""
+        paths = []
+        for dataset, by_fill in self.buffers.items():
+            # inferred over all the records (from_pylist alone only looks at the keys of the first one)
+            schema = pa.Table.from_struct_array(pa.array([rec for recs in by_fill.values() for rec in recs])).schema
+            for fill_number, recs in by_fill.items():
+                part_dir = self.partition_dir(dataset, fill_number)
+                os.makedirs(part_dir, exist_ok=True)
+                paths.append(self._write_parquet(part_dir, recs, schema))
+        self.buffers.clear()
+        return self._account(paths)
+
+    def _account(self, paths) -> Dict[str, int]:
+        n_files, n_bytes = 0, 0
+        for path in paths:
+            size = os.path.getsize(path)
+            if path not in self.sizes:
+                n_files += 1
+            n_bytes += size - self.sizes.get(path, 0)
+            self.sizes[path] = size
+
+        self.bytes_written += n_bytes
+        return {"files": n_files, "bytes": n_bytes}
+
+    def _append_jsonl(self, part_dir: str, records) -> str:
+        # appending adds a gzip member per page, gzip readers handle concatenated members
+        path = os.path.join(part_dir, "part-00000.jsonl.gz")
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+        return path
+
+    def _write_parquet(self, part_dir: str, records, schema) -> str:
+        path = os.path.join(part_dir, "part-00000.parquet")
+        pq.write_table(pa.Table.from_pylist(records, schema=schema), path, compression="zstd")
+        return path
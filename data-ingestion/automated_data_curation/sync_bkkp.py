@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 import os
-import json
 import time
+import threading
 import requests
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 from permissions.bkkp_api_personal_token import PERSONAL_TOKEN as TOKEN
+from snapshot_writer import SnapshotWriter
 
 load_dotenv()
 
@@ -22,12 +26,18 @@ LIMIT = int(os.getenv("LIMIT", "10"))  # 0 = no limit
 # true  = incremental sync using runs?filter[updatedAt][from]=...
 SYNC_MODE = os.getenv("SYNC_MODE", "false").lower() == "true"
 
+LOG_FETCH_WORKERS = int(os.getenv("LOG_FETCH_WORKERS", "8"))
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "jsonl")  # jsonl (gzip) or parquet
+
 try:
     import psycopg2
-    from psycopg2.extras import Json
+    from psycopg2.extras import Json, execute_values
 except ImportError:
     psycopg2 = None
     Json = None
+    execute_values = None
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -43,6 +53,33 @@ def get_headers():
     return headers
 
 
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session():
+    """
+    Shared keep-alive session for the bookkeeping API, with a connection per log
+    fetch worker and retries (exponential backoff) on connection errors and 429/5xx.
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            retry = Retry(
+                total=MAX_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",),
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, LOG_FETCH_WORKERS), max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.headers.update(get_headers())
+            session.verify = str(CA_BUNDLE)
+            _SESSION = session
+    return _SESSION
+
+
 def now_ms():
     return int(time.time() * 1000)
 
@@ -170,6 +207,18 @@ def init_db(conn):
             );
         """)
 
+        # resume point, committed after each page: offset of the next lhcFills page (full mode),
+        # updatedAt of the last run saved (sync mode, keyset paging)
+        cur.execute("""
+            ALTER TABLE sync_updates
+            ADD COLUMN IF NOT EXISTS resume_offset BIGINT;
+        """)
+
+        cur.execute("""
+            ALTER TABLE sync_updates
+            ADD COLUMN IF NOT EXISTS resume_updated_at BIGINT;
+        """)
+
         cur.execute("""
             CREATE INDEX IF NOT EXISTS idx_lhc_fills_beam_type
             ON bookkeeping_lhc_fills (beam_type);
@@ -238,7 +287,7 @@ def init_db(conn):
     conn.commit()
 
 
-def create_sync_update(conn, sync_mode, source_updated_at_from):
+def create_sync_update(conn, sync_mode, source_updated_at_from, resume_offset=None, resume_updated_at=None):
     if conn is None:
         return None
 
@@ -248,11 +297,13 @@ def create_sync_update(conn, sync_mode, source_updated_at_from):
                 sync_mode,
                 started_at_ms,
                 source_updated_at_from,
-                success
+                success,
+                resume_offset,
+                resume_updated_at
             )
-            VALUES (%s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s)
             RETURNING sync_id;
-        """, (sync_mode, now_ms(), source_updated_at_from, False))
+        """, (sync_mode, now_ms(), source_updated_at_from, False, resume_offset, resume_updated_at))
         sync_id = cur.fetchone()[0]
 
     conn.commit()
@@ -313,6 +364,46 @@ def finalize_sync_update(
     conn.commit()
 
 
+def save_sync_checkpoint(conn, sync_id, resume_offset=None, resume_updated_at=None):
+    if conn is None or sync_id is None:
+        return
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE sync_updates
+            SET resume_offset = %s,
+                resume_updated_at = %s
+            WHERE sync_id = %s;
+        """, (resume_offset, resume_updated_at, sync_id))
+
+    conn.commit()
+
+
+def get_resume_point(conn, sync_mode, source_updated_at_from):
+    """
+    (resume_offset, resume_updated_at) reached by the latest sync of the same kind (mode
+    and updatedAt origin) if it failed, so the new sync restarts after its last committed
+    page; (0, None) otherwise.
+    """
+    if conn is None:
+        return 0, None
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT success, resume_offset, resume_updated_at
+            FROM sync_updates
+            WHERE sync_mode = %s
+              AND source_updated_at_from IS NOT DISTINCT FROM %s
+            ORDER BY sync_id DESC
+            LIMIT 1;
+        """, (sync_mode, source_updated_at_from))
+        row = cur.fetchone()
+
+    if not row or row[0]:
+        return 0, None
+    return row[1] or 0, row[2]
+
+
 def get_last_successful_sync_updated_at(conn):
     if conn is None:
         return None
@@ -429,28 +520,125 @@ def safe_numeric(value):
             return None
 
 
-def save_json_local(filename, payload):
-    Path(OUT_DIR).mkdir(parents=True, exist_ok=True)
-    out_path = Path(OUT_DIR) / filename
+# Insertion
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
+FILL_COLUMNS = [
+    "fill_number",
+    "stable_beams_start",
+    "stable_beams_end",
+    "stable_beams_duration",
+    "beam_type",
+    "filling_scheme_name",
+    "colliding_bunches_count",
+    "delivered_luminosity",
+    "statistics_json",
+    "metadata_json",
+]
+
+RUN_COLUMNS = [
+    "run_number",
+    "id",
+    "fill_number",
+    "time_o2_start",
+    "time_o2_end",
+    "time_trg_start",
+    "time_trg_end",
+    "start_time",
+    "end_time",
+    "qc_time_start",
+    "qc_time_end",
+    "run_duration",
+    "environment_id",
+    "updated_at",
+    "run_type",
+    "definition",
+    "calibration_status",
+    "run_quality",
+    "n_detectors",
+    "n_flps",
+    "n_epns",
+    "lhc_beam_energy",
+    "lhc_beam_mode",
+    "lhc_beta_star",
+    "pdp_beam_type",
+    "pdp_workflow_parameters",
+    "trigger_value",
+    "start_of_data_transfer",
+    "end_of_data_transfer",
+    "ctf_file_count",
+    "ctf_file_size",
+    "tf_file_count",
+    "tf_file_size",
+    "other_file_count",
+    "other_file_size",
+    "cross_section",
+    "trigger_efficiency",
+    "trigger_acceptance",
+    "eor_reasons_json",
+    "detectors_qualities_json",
+    "tags_json",
+    "qc_flags_json",
+    "metadata_json",
+]
+
+LOG_COLUMNS = [
+    "log_id",
+    "run_number",
+    "title",
+    "text",
+    "author_name",
+    "created_at",
+    "origin",
+    "subtype",
+    "root_log_id",
+    "parent_log_id",
+    "tags_json",
+    "payload_json",
+]
+
+UPSERT_PAGE_SIZE = 1000
+
+
+def dedupe_rows(rows):
+    """
+    Keep the last row per key (first column), in first-seen order:
+    one multi-row ON CONFLICT DO UPDATE cannot affect the same row twice.
+    """
+    return list({row[0]: row for row in rows}.values())
 
-    size_bytes = out_path.stat().st_size
-    print(f"Saved local JSON to {out_path}")
-    return {
-        "path": str(out_path),
-        "bytes": size_bytes,
-    }
 
+def bulk_upsert(cur, table, columns, rows, update=True):
+    """
+    Multi-row INSERT ... ON CONFLICT on the first column, one statement per
+    UPSERT_PAGE_SIZE rows. Returns (inserted, updated), counted from
+    RETURNING (xmax = 0), which is true for freshly inserted rows.
+    """
+    if not rows:
+        return 0, 0
+
+    key = columns[0]
+    if update:
+        on_conflict = "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in columns[1:])
+    else:
+        on_conflict = "DO NOTHING"
+
+    results = execute_values(cur, f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES %s
+        ON CONFLICT ({key}) {on_conflict}
+        RETURNING (xmax = 0);
+    """, dedupe_rows(rows), page_size=UPSERT_PAGE_SIZE, fetch=True)
+
+    inserted = sum(1 for (is_insert,) in results if is_insert)
+    return inserted, len(results) - inserted
 
-# Insertion
 
 def ensure_fill_exists_for_runs(conn, runs):
     """
     Minimal helper for sync mode:
     if a run references a fill_number not yet present in bookkeeping_lhc_fills,
     create a placeholder fill row so the FK on bookkeeping_runs(fill_number) does not fail.
+    Returns the number of placeholder fills created.
     """
     if conn is None or not runs:
         return 0
@@ -464,71 +652,29 @@ def ensure_fill_exists_for_runs(conn, runs):
     if not fill_numbers:
         return 0
 
-    upserted = 0
+    rows = [
+        (fill_number, None, None, None, None, None, None, None,
+         Json(None), Json({"fillNumber": fill_number, "placeholder": True}))
+        for fill_number in fill_numbers
+    ]
     with conn.cursor() as cur:
-        for fill_number in fill_numbers:
-            cur.execute("""
-                INSERT INTO bookkeeping_lhc_fills (
-                    fill_number,
-                    stable_beams_start,
-                    stable_beams_end,
-                    stable_beams_duration,
-                    beam_type,
-                    filling_scheme_name,
-                    colliding_bunches_count,
-                    delivered_luminosity,
-                    statistics_json,
-                    metadata_json
-                )
-                VALUES (%s, NULL, NULL, NULL, NULL, NULL, NULL, NULL, %s, %s)
-                ON CONFLICT (fill_number) DO NOTHING;
-            """, (
-                fill_number,
-                Json(None),
-                Json({"fillNumber": fill_number, "placeholder": True}),
-            ))
-            upserted += 1
+        inserted, _ = bulk_upsert(cur, "bookkeeping_lhc_fills", FILL_COLUMNS, rows, update=False)
 
     conn.commit()
-    return upserted
+    return inserted
 
 
 def save_fills_batch(conn, fills):
     if conn is None or not fills:
         return 0
 
-    count = 0
+    rows = [extract_fill_row(fill_obj) for fill_obj in fills]
     with conn.cursor() as cur:
-        for fill_obj in fills:
-            cur.execute("""
-                INSERT INTO bookkeeping_lhc_fills (
-                    fill_number,
-                    stable_beams_start,
-                    stable_beams_end,
-                    stable_beams_duration,
-                    beam_type,
-                    filling_scheme_name,
-                    colliding_bunches_count,
-                    delivered_luminosity,
-                    statistics_json,
-                    metadata_json
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (fill_number) DO UPDATE SET
-                    stable_beams_start = EXCLUDED.stable_beams_start,
-                    stable_beams_end = EXCLUDED.stable_beams_end,
-                    stable_beams_duration = EXCLUDED.stable_beams_duration,
-                    beam_type = EXCLUDED.beam_type,
-                    filling_scheme_name = EXCLUDED.filling_scheme_name,
-                    colliding_bunches_count = EXCLUDED.colliding_bunches_count,
-                    delivered_luminosity = EXCLUDED.delivered_luminosity,
-                    statistics_json = EXCLUDED.statistics_json,
-                    metadata_json = EXCLUDED.metadata_json;
-            """, extract_fill_row(fill_obj))
-            count += 1
+        inserted, updated = bulk_upsert(cur, "bookkeeping_lhc_fills", FILL_COLUMNS, rows)
 
     conn.commit()
-    print(f"Saved {count} fills to Postgres")
+    count = inserted + updated
+    print(f"Saved {count} fills to Postgres ({inserted} inserted, {updated} updated)")
     return count
 
 
@@ -548,123 +694,13 @@ def save_runs_batch(conn, fills=None, runs=None):
                     run["fillNumber"] = fill_number
                 flat_runs.append(run)
 
-    inserted = 0
-    updated = 0
-
+    rows = [
+        extract_run_row(run, parent_fill_number=run.get("fillNumber"))
+        for run in flat_runs
+        if run.get("runNumber") and run.get("fillNumber") is not None
+    ]
     with conn.cursor() as cur:
-        for run in flat_runs:
-            run_number = run.get("runNumber")
-            fill_number = run.get("fillNumber")
-            if not run_number or fill_number is None:
-                continue
-
-            cur.execute("""
-                SELECT 1
-                FROM bookkeeping_runs
-                WHERE run_number = %s;
-            """, (run_number,))
-            exists = cur.fetchone() is not None
-
-            cur.execute("""
-                INSERT INTO bookkeeping_runs (
-                    run_number,
-                    id,
-                    fill_number,
-                    time_o2_start,
-                    time_o2_end,
-                    time_trg_start,
-                    time_trg_end,
-                    start_time,
-                    end_time,
-                    qc_time_start,
-                    qc_time_end,
-                    run_duration,
-                    environment_id,
-                    updated_at,
-                    run_type,
-                    definition,
-                    calibration_status,
-                    run_quality,
-                    n_detectors,
-                    n_flps,
-                    n_epns,
-                    lhc_beam_energy,
-                    lhc_beam_mode,
-                    lhc_beta_star,
-                    pdp_beam_type,
-                    pdp_workflow_parameters,
-                    trigger_value,
-                    start_of_data_transfer,
-                    end_of_data_transfer,
-                    ctf_file_count,
-                    ctf_file_size,
-                    tf_file_count,
-                    tf_file_size,
-                    other_file_count,
-                    other_file_size,
-                    cross_section,
-                    trigger_efficiency,
-                    trigger_acceptance,
-                    eor_reasons_json,
-                    detectors_qualities_json,
-                    tags_json,
-                    qc_flags_json,
-                    metadata_json
-                )
-                VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                )
-                ON CONFLICT (run_number) DO UPDATE SET
-                    id = EXCLUDED.id,
-                    fill_number = EXCLUDED.fill_number,
-                    time_o2_start = EXCLUDED.time_o2_start,
-                    time_o2_end = EXCLUDED.time_o2_end,
-                    time_trg_start = EXCLUDED.time_trg_start,
-                    time_trg_end = EXCLUDED.time_trg_end,
-                    start_time = EXCLUDED.start_time,
-                    end_time = EXCLUDED.end_time,
-                    qc_time_start = EXCLUDED.qc_time_start,
-                    qc_time_end = EXCLUDED.qc_time_end,
-                    run_duration = EXCLUDED.run_duration,
-                    environment_id = EXCLUDED.environment_id,
-                    updated_at = EXCLUDED.updated_at,
-                    run_type = EXCLUDED.run_type,
-                    definition = EXCLUDED.definition,
-                    calibration_status = EXCLUDED.calibration_status,
-                    run_quality = EXCLUDED.run_quality,
-                    n_detectors = EXCLUDED.n_detectors,
-                    n_flps = EXCLUDED.n_flps,
-                    n_epns = EXCLUDED.n_epns,
-                    lhc_beam_energy = EXCLUDED.lhc_beam_energy,
-                    lhc_beam_mode = EXCLUDED.lhc_beam_mode,
-                    lhc_beta_star = EXCLUDED.lhc_beta_star,
-                    pdp_beam_type = EXCLUDED.pdp_beam_type,
-                    pdp_workflow_parameters = EXCLUDED.pdp_workflow_parameters,
-                    trigger_value = EXCLUDED.trigger_value,
-                    start_of_data_transfer = EXCLUDED.start_of_data_transfer,
-                    end_of_data_transfer = EXCLUDED.end_of_data_transfer,
-                    ctf_file_count = EXCLUDED.ctf_file_count,
-                    ctf_file_size = EXCLUDED.ctf_file_size,
-                    tf_file_count = EXCLUDED.tf_file_count,
-                    tf_file_size = EXCLUDED.tf_file_size,
-                    other_file_count = EXCLUDED.other_file_count,
-                    other_file_size = EXCLUDED.other_file_size,
-                    cross_section = EXCLUDED.cross_section,
-                    trigger_efficiency = EXCLUDED.trigger_efficiency,
-                    trigger_acceptance = EXCLUDED.trigger_acceptance,
-                    eor_reasons_json = EXCLUDED.eor_reasons_json,
-                    detectors_qualities_json = EXCLUDED.detectors_qualities_json,
-                    tags_json = EXCLUDED.tags_json,
-                    qc_flags_json = EXCLUDED.qc_flags_json,
-                    metadata_json = EXCLUDED.metadata_json;
-            """, extract_run_row(run, parent_fill_number=fill_number))
-
-            if exists:
-                updated += 1
-            else:
-                inserted += 1
+        inserted, updated = bulk_upsert(cur, "bookkeeping_runs", RUN_COLUMNS, rows)
 
     conn.commit()
     total = inserted + updated
@@ -676,57 +712,14 @@ def save_logs_batch(conn, all_logs):
     if conn is None or not all_logs:
         return {"inserted": 0, "updated": 0, "total": 0}
 
-    inserted = 0
-    updated = 0
-
+    rows = [
+        extract_log_row(log, run_number)
+        for run_number, logs in all_logs.items()
+        for log in logs
+        if log.get("id")
+    ]
     with conn.cursor() as cur:
-        for run_number, logs in all_logs.items():
-            for log in logs:
-                log_id = log.get("id")
-                if not log_id:
-                    continue
-
-                cur.execute("""
-                    SELECT 1
-                    FROM bookkeeping_run_logs
-                    WHERE log_id = %s;
-                """, (log_id,))
-                exists = cur.fetchone() is not None
-
-                cur.execute("""
-                    INSERT INTO bookkeeping_run_logs (
-                        log_id,
-                        run_number,
-                        title,
-                        text,
-                        author_name,
-                        created_at,
-                        origin,
-                        subtype,
-                        root_log_id,
-                        parent_log_id,
-                        tags_json,
-                        payload_json
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (log_id) DO UPDATE SET
-                        run_number = EXCLUDED.run_number,
-                        title = EXCLUDED.title,
-                        text = EXCLUDED.text,
-                        author_name = EXCLUDED.author_name,
-                        created_at = EXCLUDED.created_at,
-                        origin = EXCLUDED.origin,
-                        subtype = EXCLUDED.subtype,
-                        root_log_id = EXCLUDED.root_log_id,
-                        parent_log_id = EXCLUDED.parent_log_id,
-                        tags_json = EXCLUDED.tags_json,
-                        payload_json = EXCLUDED.payload_json;
-                """, extract_log_row(log, run_number))
-
-                if exists:
-                    updated += 1
-                else:
-                    inserted += 1
+        inserted, updated = bulk_upsert(cur, "bookkeeping_run_logs", LOG_COLUMNS, rows)
 
     conn.commit()
     total = inserted + updated
@@ -735,62 +728,184 @@ def save_logs_batch(conn, all_logs):
 
 
 
-def fetch_lhc_fills():
-    print("Fetching LHC fills from API...")
+def iter_pages(url, sort_field, start_offset=0):
+    """
+    Page through a bookkeeping list endpoint with page[limit]/page[offset], yielding
+    (offset, records) as each page arrives. Stops on a short page or after LIMIT records
+    fetched by this call.
+
+    The pages are sorted by `sort_field` ascending: the API default is newest first, where
+    every new record shifts the offsets and a resumed sync would skip or repeat records.
+    With an ascending order on a field that does not change (fillNumber) new records are
+    appended after the pages already fetched. For a field that changes, see
+    iter_runs_updated_since_pages.
+    """
+    offset = start_offset
+    while True:
+        page_limit = PAGE_SIZE if LIMIT <= 0 else min(PAGE_SIZE, LIMIT - (offset - start_offset))
+        if page_limit <= 0:
+            return
+
+        response = get_session().get(
+            url,
+            params={f"sort[{sort_field}]": "asc", "page[limit]": page_limit, "page[offset]": offset},
+            timeout=TIMEOUT,
+        )
+        response.raise_for_status()
 
-    response = requests.get(
-        LHC_FILLS_URL,
-        headers=get_headers(),
-        verify=str(CA_BUNDLE),
-        timeout=TIMEOUT,
-    )
-    response.raise_for_status()
+        payload = response.json()
+        records = payload.get("data", [])
+        if records:
+            yield offset, records
 
-    payload = response.json()
-    fills = payload.get("data", [])
+        if len(records) < page_limit:
+            return
+        offset += len(records)
 
-    if LIMIT > 0:
-        fills = fills[:LIMIT]
 
-    print(f"Fetched {len(fills)} fills")
-    return fills
+def iter_lhc_fill_pages(start_offset=0):
+    print(f"Fetching LHC fills from API, {PAGE_SIZE} per page from offset {start_offset}...")
+    return iter_pages(LHC_FILLS_URL, "fillNumber", start_offset)
 
 
-def fetch_runs_updated_since(updated_at_from):
-    url = f"https://ali-bookkeeping.cern.ch/api/runs?filter[updatedAt][from]={updated_at_from}&token={TOKEN}"
-
-    print(f"Fetching updated runs from API since updatedAt={updated_at_from}...")
-    response = requests.get(
-        url,
-        headers=get_headers(),
-        verify=str(CA_BUNDLE),
-        timeout=TIMEOUT,
-    )
-    response.raise_for_status()
+def iter_runs_updated_since_pages(updated_at_from):
+    """
+    Keyset pages of the runs updated since `updated_at_from`, yielding (updatedAt cursor, runs)
+    where the cursor is the largest updatedAt fetched so far (the resume point once the
+    page is saved). Stops after LIMIT runs.
+
+    Offsets are not stable here: a run updated during the sync moves to the end of the
+    updatedAt order and shifts the later ones, so every page is requested again from
+    filter[updatedAt][from]=<cursor>. The runs already returned at the cursor's updatedAt
+    come first in that page; they are requested on top of the page size and dropped by
+    runNumber, so a group of runs sharing one updatedAt never stalls the paging.
+    """
+    url = f"https://ali-bookkeeping.cern.ch/api/runs?token={TOKEN}"
+    print(f"Fetching updated runs from API since updatedAt={updated_at_from}, {PAGE_SIZE} per page...")
+
+    cursor = updated_at_from
+    seen_at_cursor = set()  # runNumbers already yielded whose updatedAt == cursor
+    n_fetched = 0
+    while True:
+        page_limit = PAGE_SIZE if LIMIT <= 0 else min(PAGE_SIZE, LIMIT - n_fetched)
+        if page_limit <= 0:
+            return
+
+        request_limit = page_limit + len(seen_at_cursor)
+        response = get_session().get(
+            url,
+            params={
+                "filter[updatedAt][from]": cursor,
+                "sort[updatedAt]": "asc",
+                "page[limit]": request_limit,
+                "page[offset]": 0,
+            },
+            timeout=TIMEOUT,
+        )
+        response.raise_for_status()
+
+        records = response.json().get("data", [])
+        runs = [
+            run for run in records
+            if not (run.get("updatedAt") == cursor and run.get("runNumber") in seen_at_cursor)
+        ][:page_limit]
+
+        for run in runs:
+            updated_at = run.get("updatedAt")
+            if updated_at is None:
+                continue
+            if updated_at > cursor:
+                cursor, seen_at_cursor = updated_at, set()
+            if updated_at == cursor:
+                seen_at_cursor.add(run.get("runNumber"))
+
+        if runs:
+            n_fetched += len(runs)
+            yield cursor, runs
+
+        if len(records) < request_limit or not runs:
+            return
 
-    payload = response.json()
-    runs = payload.get("data", [])
 
-    if LIMIT > 0:
-        runs = runs[:LIMIT]
+def fetch_lhc_fills():
+    fills = [fill_obj for _, page in iter_lhc_fill_pages() for fill_obj in page]
+    print(f"Fetched {len(fills)} fills")
+    return fills
+
 
+def fetch_runs_updated_since(updated_at_from):
+    runs = [run for _, page in iter_runs_updated_since_pages(updated_at_from) for run in page]
     print(f"Fetched {len(runs)} updated runs")
     return runs
 
 
-def fetch_run_logs(run_number):
+def fetch_run_logs(run_number, watermark=None):
+    """
+    Logs of one run. With a (max created_at, max log_id) watermark, only logs from the
+    watermark's created_at on are requested (filter[created][from], inclusive so a log
+    created in the same millisecond is not lost), and the ones already stored are
+    dropped here by id.
+    """
     url = f"https://ali-bookkeeping.cern.ch/api/runs/{run_number}/logs?token={TOKEN}"
 
-    response = requests.get(
-        url,
-        headers=get_headers(),
-        verify=str(CA_BUNDLE),
-        timeout=TIMEOUT,
-    )
+    params = {}
+    if watermark is not None and watermark[0] is not None:
+        params["filter[created][from]"] = watermark[0]
+
+    response = get_session().get(url, params=params, timeout=TIMEOUT)
     response.raise_for_status()
 
     payload = response.json()
-    return payload.get("data", [])
+    logs = payload.get("data", [])
+    if watermark is not None:
+        logs = [log for log in logs if is_newer_than_watermark(log, watermark)]
+    return logs
+
+
+def is_newer_than_watermark(log, watermark):
+    max_created_at, max_log_id = watermark
+    created_at = log.get("createdAt")
+    log_id = log.get("id")
+    return (
+        (max_log_id is None or (log_id is not None and log_id > max_log_id))
+        or (max_created_at is None or (created_at is not None and created_at > max_created_at))
+    )
+
+
+def get_log_watermarks(conn, run_numbers):
+    """{run_number: (max created_at, max log_id)} of the logs already in bookkeeping_run_logs."""
+    if conn is None or not run_numbers:
+        return {}
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT run_number, MAX(created_at), MAX(log_id)
+            FROM bookkeeping_run_logs
+            WHERE run_number = ANY(%s)
+            GROUP BY run_number;
+        """, (list(run_numbers),))
+        rows = cur.fetchall()
+
+    conn.commit()
+    return {run_number: (max_created_at, max_log_id) for run_number, max_created_at, max_log_id in rows}
+
+
+def fetch_logs_for_runs(run_numbers, max_workers=LOG_FETCH_WORKERS, watermarks=None):
+    """
+    fetch_run_logs for every run, with up to max_workers requests in flight on the
+    shared session. Returns {run_number: logs} in the order of run_numbers.
+    With `watermarks` (see get_log_watermarks), only the logs newer than the run's
+    watermark are fetched.
+    """
+    run_numbers = list(dict.fromkeys(run_number for run_number in run_numbers if run_number))
+    if not run_numbers:
+        return {}
+
+    watermarks = watermarks or {}
+    print(f"Fetching logs of {len(run_numbers)} runs ({len(watermarks)} incremental) with {max_workers} workers...")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        results = pool.map(lambda run_number: fetch_run_logs(run_number, watermarks.get(run_number)), run_numbers)
+        return dict(zip(run_numbers, results))
 
 
 # ---------------- transform helpers ----------------
@@ -816,9 +931,17 @@ def group_runs_as_fill_like_objects(runs):
 
 
 
+def close_snapshot(snapshot, sync_stats):
+    """Write what the snapshot still buffers (parquet) and count it in the sync stats."""
+    local_info = snapshot.close()
+    sync_stats["local_files_written"] += local_info["files"]
+    sync_stats["local_bytes_written"] += local_info["bytes"]
+
+
 def main():
     conn = None
     sync_id = None
+    snapshot = None
     sync_stats = {
         "fills_seen": 0,
         "runs_seen": 0,
@@ -846,101 +969,114 @@ def main():
                 print("No previous successful sync found, falling back to full fetch.")
         sync_mode_label = "sync" if (SYNC_MODE and source_updated_at_from is not None) else "full"
 
+        resume_offset, resume_updated_at = get_resume_point(conn, sync_mode_label, source_updated_at_from)
+        if resume_offset:
+            print(f"Resuming interrupted {sync_mode_label} sync from page offset {resume_offset}")
+        if resume_updated_at is not None:
+            print(f"Resuming interrupted {sync_mode_label} sync from updatedAt={resume_updated_at}")
+
         if conn:
-            sync_id = create_sync_update(conn, sync_mode_label, source_updated_at_from)
+            sync_id = create_sync_update(conn, sync_mode_label, source_updated_at_from, resume_offset, resume_updated_at)
 
-        all_logs = {}
+        snapshot = SnapshotWriter(OUT_DIR, sync_id if sync_id is not None else f"local-{now_ms()}", SNAPSHOT_FORMAT)
 
         # -------- sync mode --------
         if SYNC_MODE and source_updated_at_from is not None:
-            runs = fetch_runs_updated_since(source_updated_at_from)
-            sync_stats["runs_seen"] = len(runs)
-
-            if runs:
-                sync_stats["max_run_updated_at_seen"] = max(
+            fills_seen = set()
+
+            # every page is written to Postgres and checkpointed before the next one is fetched;
+            # runs at the checkpoint's updatedAt are fetched again on resume and upserted twice
+            start_updated_at = source_updated_at_from if resume_updated_at is None else resume_updated_at
+            max_updated_at = start_updated_at
+            for cursor, runs in iter_runs_updated_since_pages(start_updated_at):
+                sync_stats["runs_seen"] += len(runs)
+                max_updated_at = max(
                     (run.get("updatedAt") for run in runs if run.get("updatedAt") is not None),
-                    default=source_updated_at_from
+                    default=max_updated_at
                 )
-            else:
-                sync_stats["max_run_updated_at_seen"] = source_updated_at_from
 
-            for run in runs:
-                run_number = run.get("runNumber")
-                if not run_number:
-                    continue
+                # only the logs created after what is already stored for each run; they are not
+                # the run's full log list, so they go to the run_logs dataset and run["logs"] is left unset
+                run_numbers = [run.get("runNumber") for run in runs if run.get("runNumber")]
+                all_logs = fetch_logs_for_runs(run_numbers, watermarks=get_log_watermarks(conn, run_numbers))
+                sync_stats["logs_seen"] += sum(len(logs) for logs in all_logs.values())
+
+                fills_seen.update(fill_obj["fillNumber"] for fill_obj in group_runs_as_fill_like_objects(runs))
 
-                logs = fetch_run_logs(run_number)
-                all_logs[run_number] = logs
-                run["logs"] = logs
-                sync_stats["logs_seen"] += len(logs)
+                fill_numbers = {run.get("runNumber"): run.get("fillNumber") for run in runs}
+                new_logs = [
+                    {**log, "runNumber": run_number, "fillNumber": fill_numbers.get(run_number)}
+                    for run_number, logs in all_logs.items()
+                    for log in logs
+                ]
+                for dataset, records in (("runs", runs), ("run_logs", new_logs)):
+                    local_info = snapshot.write(dataset, records)
+                    sync_stats["local_files_written"] += local_info["files"]
+                    sync_stats["local_bytes_written"] += local_info["bytes"]
 
-            fill_like_objects = group_runs_as_fill_like_objects(runs)
-            sync_stats["fills_seen"] = len(fill_like_objects)
+                # make sure referenced fills exist before saving runs
+                fills_upserted = ensure_fill_exists_for_runs(conn, runs)
+                sync_stats["fills_upserted"] += fills_upserted
 
-            local_info = save_json_local("runs_sync.json", runs)
-            sync_stats["local_files_written"] += 1
-            sync_stats["local_bytes_written"] += local_info["bytes"]
+                run_result = save_runs_batch(conn, runs=runs)
+                sync_stats["runs_inserted"] += run_result["inserted"]
+                sync_stats["runs_updated"] += run_result["updated"]
 
-            # make sure referenced fills exist before saving runs
-            fills_upserted = ensure_fill_exists_for_runs(conn, runs)
-            sync_stats["fills_upserted"] += fills_upserted
+                log_result = save_logs_batch(conn, all_logs)
+                sync_stats["logs_inserted"] += log_result["inserted"]
+                sync_stats["logs_updated"] += log_result["updated"]
 
-            run_result = save_runs_batch(conn, runs=runs)
-            sync_stats["runs_inserted"] += run_result["inserted"]
-            sync_stats["runs_updated"] += run_result["updated"]
+                save_sync_checkpoint(conn, sync_id, resume_updated_at=cursor)
 
-            log_result = save_logs_batch(conn, all_logs)
-            sync_stats["logs_inserted"] += log_result["inserted"]
-            sync_stats["logs_updated"] += log_result["updated"]
+            sync_stats["fills_seen"] = len(fills_seen)
+            sync_stats["max_run_updated_at_seen"] = max_updated_at
 
-            print(f"Sync mode complete: {len(runs)} runs processed")
+            print(f"Sync mode complete: {sync_stats['runs_seen']} runs processed")
 
         # -------- full mode --------
         else:
-            fills = fetch_lhc_fills()
-            sync_stats["fills_seen"] = len(fills)
-
-            total_runs = 0
             max_updated_at = None
 
-            for fill_obj in fills:
-                runs = fill_obj.get("runs", []) or []
-                total_runs += len(runs)
+            for offset, fills in iter_lhc_fill_pages(resume_offset):
+                sync_stats["fills_seen"] += len(fills)
 
-                for run in runs:
+                all_runs = [run for fill_obj in fills for run in (fill_obj.get("runs", []) or [])]
+                sync_stats["runs_seen"] += len(all_runs)
+                for run in all_runs:
                     updated_at = run.get("updatedAt")
                     if updated_at is not None:
                         if max_updated_at is None or updated_at > max_updated_at:
                             max_updated_at = updated_at
 
+                all_logs = fetch_logs_for_runs([run.get("runNumber") for run in all_runs])
+                for run in all_runs:
                     run_number = run.get("runNumber")
-                    if not run_number:
-                        continue
+                    if run_number in all_logs:
+                        run["logs"] = all_logs[run_number]
+                sync_stats["logs_seen"] += sum(len(logs) for logs in all_logs.values())
 
-                    logs = fetch_run_logs(run_number)
-                    all_logs[run_number] = logs
-                    run["logs"] = logs
-                    sync_stats["logs_seen"] += len(logs)
+                local_info = snapshot.write("lhc_fills", fills)
+                sync_stats["local_files_written"] += local_info["files"]
+                sync_stats["local_bytes_written"] += local_info["bytes"]
 
-            sync_stats["runs_seen"] = total_runs
-            sync_stats["max_run_updated_at_seen"] = max_updated_at
+                fills_saved = save_fills_batch(conn, fills)
+                sync_stats["fills_upserted"] += fills_saved
+
+                run_result = save_runs_batch(conn, fills=fills)
+                sync_stats["runs_inserted"] += run_result["inserted"]
+                sync_stats["runs_updated"] += run_result["updated"]
 
-            print(f"Total nested runs found: {total_runs}")
+                log_result = save_logs_batch(conn, all_logs)
+                sync_stats["logs_inserted"] += log_result["inserted"]
+                sync_stats["logs_updated"] += log_result["updated"]
 
-            local_info = save_json_local("lhc_fills.json", fills)
-            sync_stats["local_files_written"] += 1
-            sync_stats["local_bytes_written"] += local_info["bytes"]
+                save_sync_checkpoint(conn, sync_id, resume_offset=offset + len(fills))
 
-            fills_saved = save_fills_batch(conn, fills)
-            sync_stats["fills_upserted"] += fills_saved
+            sync_stats["max_run_updated_at_seen"] = max_updated_at
 
-            run_result = save_runs_batch(conn, fills=fills)
-            sync_stats["runs_inserted"] += run_result["inserted"]
-            sync_stats["runs_updated"] += run_result["updated"]
+            print(f"Total nested runs found: {sync_stats['runs_seen']}")
 
-            log_result = save_logs_batch(conn, all_logs)
-            sync_stats["logs_inserted"] += log_result["inserted"]
-            sync_stats["logs_updated"] += log_result["updated"]
+        close_snapshot(snapshot, sync_stats)
 
         finalize_sync_update(
             conn,
@@ -951,6 +1087,11 @@ def main():
         )
 
     except Exception as e:
+        if snapshot is not None:
+            try:
+                close_snapshot(snapshot, sync_stats)  # keep what was fetched before the error
+            except Exception as close_err:
+                print(f"Could not write the snapshot: {close_err}")
         finalize_sync_update(
             conn,
             sync_id,
@@ -1,26 +1,43 @@
 #!/usr/bin/env python3
+import csv
 import datetime
+import io
 import json
 import logging
 import os
+import random
 import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from json import JSONDecodeError
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 from urllib.parse import quote
 
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+from listing_cache import ListingCache
+from object_store import ObjectStore
+
+# the metadata journal is shared with the data-ingestion scripts one folder up
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from metadata_journal import append_records, journal_path
+
 load_dotenv()
 
 try:
     import psycopg2
     from psycopg2.extras import Json
+    from psycopg2.pool import ThreadedConnectionPool
 except ImportError:
     psycopg2 = None
     Json = None
+    ThreadedConnectionPool = None
 
 
 logger = logging.getLogger(__name__)
@@ -55,11 +72,132 @@ class ObjectVersion:
         )
 
 
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# rough size of one version in a /browse JSON listing, to turn a version count into a body size
+LISTING_BYTES_PER_VERSION = 2048
+
+
+class ListingTooLarge(RuntimeError):
+    """A listing body announced (Content-Length) larger than the caller accepts, not downloaded."""
+
+    def __init__(self, url: str, size: int):
+        super().__init__(f"Listing {url} is {size} bytes")
+        self.url = url
+        self.size = size
+
+
 class Ccdb:
-    def __init__(self, url: str, timeout: int = 60):
+    def __init__(
+        self,
+        url: str,
+        timeout: int = 60,
+        listing_cache: Optional[ListingCache] = None,
+        pool_size: int = 10,
+        max_retries: int = 3,
+        backoff_s: float = 0.5,
+    ):
         self.url = url.rstrip("/")
         self.timeout = timeout
+        self.listing_cache = listing_cache
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+
+        # keep-alive connections, reused by every request of the sync
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.stats_lock = threading.Lock()
+        self.stats = self._new_stats()
+        # per-thread counters, a prefix is synced on one thread while others share the client
+        self.thread_local = threading.local()
+
+    @staticmethod
+    def _new_stats() -> Dict:
+        return {"requests": 0, "retries": 0, "failures": 0, "latency_s_total": 0.0, "latency_s_max": 0.0}
+
+    def _count(self, latency_s: float, retried: bool = False, failed: bool = False):
+        if not hasattr(self.thread_local, "stats"):
+            self.thread_local.stats = self._new_stats()
+        with self.stats_lock:
+            for stats in (self.stats, self.thread_local.stats):
+                stats["requests"] += 1
+                stats["retries"] += int(retried)
+                stats["failures"] += int(failed)
+                stats["latency_s_total"] += latency_s
+                stats["latency_s_max"] = max(stats["latency_s_max"], latency_s)
+
+    def reset_thread_stats(self):
+        """Start the calling thread's counters over, ex. when it moves on to the next prefix."""
+        with self.stats_lock:
+            self.thread_local.stats = self._new_stats()
+
+    def stats_snapshot(self, thread: bool = False) -> Dict:
+        """Counters of the whole client, or of the calling thread only."""
+        with self.stats_lock:
+            if thread:
+                return dict(getattr(self.thread_local, "stats", None) or self._new_stats())
+            return dict(self.stats)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET with jittered exponential backoff on connection errors, timeouts and
+        429/5xx answers (GETs are idempotent). The last error is raised.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            t0 = time.monotonic()
+            try:
+                r = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                self._count(time.monotonic() - t0, retried=not last_attempt, failed=last_attempt)
+                if last_attempt:
+                    raise
+                logger.warning("GET %s failed (%s), retry %d/%d", url, err, attempt + 1, self.max_retries)
+            else:
+                if r.status_code not in RETRY_STATUS or last_attempt:
+                    self._count(time.monotonic() - t0, failed=r.status_code >= 400)
+                    return r
+                self._count(time.monotonic() - t0, retried=True)
+                logger.warning("GET %s returned %d, retry %d/%d", url, r.status_code, attempt + 1, self.max_retries)
+                r.close()
+            time.sleep(random.uniform(0, self.backoff_s * 2 ** attempt))
+
+    def get_json_listing(self, url: str, headers: Dict[str, str], max_bytes: Optional[int] = None):
+        """
+        GET a JSON listing, through the listing cache when there is one.
+        With `max_bytes`, a response whose Content-Length is larger raises ListingTooLarge
+        before its body is read.
+        """
+        cache = self.listing_cache
+        entry = cache.get(url, headers) if cache is not None else None
+        if entry is not None and cache.is_fresh(entry):
+            cache.count("hits")
+            return entry["payload"]
+
+        request_headers = dict(headers)
+        if cache is not None:
+            request_headers.update(cache.conditional_headers(entry))
+
+        r = self.get(url, headers=request_headers, stream=max_bytes is not None)
+        size = int(r.headers.get("Content-Length") or 0)
+        if max_bytes is not None and r.status_code == 200 and size > max_bytes:
+            r.close()
+            raise ListingTooLarge(url, size)
+        if r.status_code == 304 and entry is not None:
+            cache.count("revalidated")
+            cache.put(url, headers, entry["payload"], entry.get("etag"), entry.get("last_modified"))
+            return entry["payload"]
+        r.raise_for_status()
+
+        payload = r.json()
+        if cache is not None:
+            cache.count("misses")
+            cache.put(url, headers, payload, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        return payload
 
     def get_objects_list(
         self,
@@ -77,11 +215,8 @@ class Ccdb:
             headers["If-Not-Before"] = str(added_since)
 
         logger.info("Listing recent objects from %s", url)
-        r = self.session.get(url, headers=headers, timeout=self.timeout)
-        r.raise_for_status()
-
         try:
-            payload = r.json()
+            payload = self.get_json_listing(url, headers)
         except JSONDecodeError as err:
             logger.error("JSON decode error in get_objects_list: %s", err)
             raise
@@ -95,6 +230,7 @@ class Ccdb:
         to_ts: str = "",
         run: int = -1,
         metadata: str = "",
+        max_bytes: Optional[int] = None,
     ) -> List[ObjectVersion]:
         url = f"{self.url}/browse/{quote(object_path, safe='/')}"
         if run != -1:
@@ -102,18 +238,15 @@ class Ccdb:
         if metadata:
             url += metadata
 
-        headers = {"Accept": "application/json", "Connection": "close"}
+        headers = {"Accept": "application/json"}
         if from_ts != "":
             headers["If-Not-Before"] = str(from_ts)
         if to_ts != "":
             headers["If-Not-After"] = str(to_ts)
 
         logger.info("Listing versions for %s", object_path)
-        r = self.session.get(url, headers=headers, timeout=self.timeout)
-        r.raise_for_status()
-
         try:
-            payload = r.json()
+            payload = self.get_json_listing(url, headers, max_bytes=max_bytes)
         except ValueError as err:
             raise RuntimeError(f"Error reading JSON for object {object_path}: {err}") from err
 
@@ -131,12 +264,79 @@ class Ccdb:
         versions.sort(key=lambda v: v.created_at)
         return versions
 
-    def load_existing_etags(self, conn) -> set:
+    def iter_version_windows(
+        self,
+        object_path: str,
+        from_ts: Optional[int] = None,
+        to_ts: Optional[int] = None,
+        window_ms: int = 7 * 24 * 3600 * 1000,
+        max_per_window: int = 1000,
+        min_window_ms: int = 60 * 1000,
+    ) -> Iterator[List[ObjectVersion]]:
+        """
+        List the versions of `object_path` created in [from_ts, to_ts] as consecutive
+        If-Not-Before/If-Not-After windows, yielding each window (sorted by creation time)
+        as it arrives. Sparse windows double the width of the next one.
+
+        A window whose announced body size exceeds `max_per_window` versions is narrowed
+        in proportion before its body is downloaded; without a Content-Length, a window
+        with more than `max_per_window` versions is listed again at half the width.
+        Without `to_ts` the last window is left open (no If-Not-After), so its request,
+        and cache key, does not change with the current time.
+        """
+        start = int(from_ts) if from_ts is not None else 0
+        end = int(to_ts) if to_ts is not None else int(time.time() * 1000)
+        max_bytes = max_per_window * LISTING_BYTES_PER_VERSION
+
+        while start <= end:
+            stop = min(start + window_ms - 1, end)
+            narrowable = stop - start + 1 > min_window_ms
+            try:
+                versions = self.get_versions_list(
+                    object_path=object_path,
+                    from_ts=str(start),
+                    to_ts="" if to_ts is None and stop == end else str(stop),
+                    max_bytes=max_bytes if narrowable else None,
+                )
+            except ListingTooLarge as err:
+                window_ms = max(min_window_ms, min(window_ms // 2, window_ms * max_bytes // err.size))
+                continue
+
+            if len(versions) > max_per_window and narrowable:
+                window_ms = max(min_window_ms, window_ms // 2)
+                continue
+
+            yield versions
+            start = stop + 1
+            if len(versions) < max_per_window // 4:
+                window_ms *= 2
+
+    def iter_versions(self, object_path: str, from_ts: Optional[int] = None, to_ts: Optional[int] = None,
+                      **kwargs) -> Iterator[ObjectVersion]:
+        for versions in self.iter_version_windows(object_path, from_ts, to_ts, **kwargs):
+            yield from versions
+
+    def find_missing_etags(self, conn, etags: List[str], chunk_size: int = 10000) -> set:
+        """
+        ETags of a version listing that are not in qcdb_objects yet. The candidates are
+        sent as one array per chunk and anti-joined on the etag unique index, so the cost
+        depends on the listing size, not on the size of the table.
+        """
+        etags = sorted({e for e in etags if e})
         if conn is None:
-            return set()
+            return set(etags)
+
+        missing = set()
         with conn.cursor() as cur:
-            cur.execute("SELECT etag FROM qcdb_objects;")
-            return {row[0] for row in cur.fetchall()}
+            for i in range(0, len(etags), chunk_size):
+                cur.execute("""
+                    SELECT c.etag
+                    FROM unnest(%s::text[]) AS c(etag)
+                    WHERE NOT EXISTS (SELECT 1 FROM qcdb_objects o WHERE o.etag = c.etag);
+                """, (etags[i:i + chunk_size],))
+                missing.update(row[0] for row in cur.fetchall())
+        conn.commit()
+        return missing
 
     def download_version(self, version: ObjectVersion) -> requests.Response:
         etag = version.metadata.get("ETag")
@@ -151,7 +351,7 @@ class Ccdb:
         else:
             raise RuntimeError(f"Cannot download {version.path}: missing both ETag and uuid")
 
-        r = self.session.get(url, stream=True, timeout=self.timeout)
+        r = self.get(url, stream=True)
         r.raise_for_status()
         return r
 
@@ -170,17 +370,15 @@ def save_response_to_file(resp: requests.Response, outdir: str, fallback_name: s
     return dst
 
 
-def save_json_to_file_flat(data, outdir: str, ccdb_path: str):
-    fpath = (Path(outdir) / ccdb_path).with_suffix(".json")
-    fpath.parent.mkdir(parents=True, exist_ok=True)
-    with fpath.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def save_json_to_file_flat(data, outdir: str, ccdb_path: str, compress: bool = False):
+    """Append the metadata records to the JSON Lines journal of `ccdb_path`."""
+    append_records(journal_path(outdir, ccdb_path, compress), data)
 
 
-def get_pg_conn(use_postgres: bool, pg_conn_str: Optional[str]):
+def get_pg_pool(use_postgres: bool, pg_conn_str: Optional[str], max_connections: int):
     if not use_postgres or psycopg2 is None:
         return None
-    return psycopg2.connect(pg_conn_str)
+    return ThreadedConnectionPool(1, max_connections, pg_conn_str)
 
 
 def init_db(conn):
@@ -212,43 +410,99 @@ def init_db(conn):
                 details_json JSONB NOT NULL DEFAULT '{}'::jsonb
             );
         """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS qcdb_sync_run_items (
+                id BIGSERIAL PRIMARY KEY,
+                sync_run_id INTEGER NOT NULL REFERENCES qcdb_sync_runs(id) ON DELETE CASCADE,
+                status TEXT NOT NULL,
+                qc_path TEXT,
+                etag TEXT,
+                file_name TEXT,
+                error TEXT
+            );
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_qcdb_sync_run_items_sync_run_id
+            ON qcdb_sync_run_items (sync_run_id);
+        """)
     conn.commit()
 
 
+SYNC_RUN_ITEM_STATUSES = ("downloaded", "skipped", "failed")
+
+
+def copy_rows(cur, table: str, columns: List[str], rows) -> None:
+    """COPY `rows` (tuples, None for NULL) into `table` in one round-trip."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
 def save_batch_to_postgres(conn, rows):
+    """
+    Upsert the metadata of downloaded versions: COPY into a temporary staging table,
+    then a single INSERT ... SELECT ... ON CONFLICT (etag) DO NOTHING.
+    """
     if conn is None or not rows:
         return
 
+    staged = []
+    for qc_path, obj in rows:
+        etag = str(obj.get("ETag", "")).strip('"')
+        if not etag:
+            continue
+        staged.append((
+            qc_path,
+            obj.get("fileName"),
+            etag,
+            obj.get("Created") or obj.get("created"),
+            json.dumps(obj, ensure_ascii=False),
+        ))
+    if not staged:
+        return
+
+    columns = ["qc_path", "file_name", "etag", "created_at", "metadata_json"]
     with conn.cursor() as cur:
-        for qc_path, obj in rows:
-            etag = str(obj.get("ETag", "")).strip('"')
-            if not etag:
-                continue
-            cur.execute("""
-                INSERT INTO qcdb_objects (qc_path, file_name, etag, created_at, metadata_json)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (etag) DO NOTHING;
-            """, (
-                qc_path,
-                obj.get("fileName"),
-                etag,
-                obj.get("Created") or obj.get("created"),
-                Json(obj),
-            ))
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS qcdb_objects_staging (
+                qc_path TEXT,
+                file_name TEXT,
+                etag TEXT,
+                created_at BIGINT,
+                metadata_json JSONB
+            ) ON COMMIT DELETE ROWS;
+        """)
+        copy_rows(cur, "qcdb_objects_staging", columns, staged)
+        cur.execute("""
+            INSERT INTO qcdb_objects (qc_path, file_name, etag, created_at, metadata_json)
+            SELECT DISTINCT ON (etag) qc_path, file_name, etag, created_at, metadata_json
+            FROM qcdb_objects_staging
+            ORDER BY etag
+            ON CONFLICT (etag) DO NOTHING;
+        """)
     conn.commit()
 
 
 def save_sync_run(conn, qc_prefix, since_ms, started_at, finished_at, downloaded, skipped_existing, failed, details):
+    """
+    One qcdb_sync_runs row with the counters and the run summary (details without the
+    per-item lists); the downloaded/skipped/failed items go to qcdb_sync_run_items.
+    """
     if conn is None:
         return
 
+    summary = {k: v for k, v in details.items() if k not in SYNC_RUN_ITEM_STATUSES}
     with conn.cursor() as cur:
         cur.execute("""
             INSERT INTO qcdb_sync_runs (
                 qc_prefix, since_ms, started_at, finished_at,
                 downloaded, skipped_existing, failed, details_json
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id;
         """, (
             qc_prefix,
             since_ms,
@@ -257,8 +511,20 @@ def save_sync_run(conn, qc_prefix, since_ms, started_at, finished_at, downloaded
             downloaded,
             skipped_existing,
             failed,
-            Json(details),
+            Json(summary),
         ))
+        sync_run_id = cur.fetchone()[0]
+
+        copy_rows(
+            cur,
+            "qcdb_sync_run_items",
+            ["sync_run_id", "status", "qc_path", "etag", "file_name", "error"],
+            (
+                (sync_run_id, status, item.get("qc_path"), item.get("etag") or None, item.get("file_name"), item.get("error"))
+                for status in SYNC_RUN_ITEM_STATUSES
+                for item in details.get(status, [])
+            ),
+        )
     conn.commit()
 
 
@@ -282,11 +548,19 @@ def download_objects(
     conn=None,
     limit_objects: Optional[int] = None,
     limit_versions: Optional[int] = None,
+    store: Optional[ObjectStore] = None,
 ):
+    """
+    Download the versions of every object under `qc_prefix` added since `since_ms`.
+    With `store`, payloads go to the ETag-addressed ObjectStore and
+    <out_dir>/<object path>/<file name> is a link to the blob.
+    """
     logger.info("")
     logger.info("Processing prefix: %s", qc_prefix)
 
     started_at = datetime.datetime.now()
+    # the prefix is synced on this thread only, its counters (latency_s_max included) are the prefix's
+    ccdb.reset_thread_stats()
 
     object_paths = ccdb.get_objects_list(
         added_since=since_ms,
@@ -296,7 +570,7 @@ def download_objects(
     if limit_objects:
         object_paths = object_paths[:limit_objects]
 
-    existing_etags = ccdb.load_existing_etags(conn)
+    downloaded_etags = set()
 
     total_downloaded = 0
     total_skipped = 0
@@ -305,64 +579,76 @@ def download_objects(
 
     for object_path in object_paths:
         try:
-            versions = ccdb.get_versions_list(
-                object_path=object_path,
-                from_ts=str(since_ms) if since_ms is not None else "",
-            )
-
-            logger.info("Found %d versions under %s", len(versions), object_path)
-
-            if limit_versions:
-                versions = versions[:limit_versions]
-            if not versions:
-                continue
-
             local_metadata = []
-            batch = []
-
-            for version in tqdm(versions, desc=object_path, leave=False):
-                etag = str(version.metadata.get("ETag", "")).strip('"')
-                file_name = version.metadata.get("fileName")
+            n_versions = 0
+
+            # versions arrive window by window, downloads start before the listing is complete
+            for versions in ccdb.iter_version_windows(object_path=object_path, from_ts=since_ms):
+                if limit_versions:
+                    versions = versions[:limit_versions - n_versions]
+                n_versions += len(versions)
+
+                missing_etags = ccdb.find_missing_etags(
+                    conn, [str(v.metadata.get("ETag", "")).strip('"') for v in versions]
+                ) - downloaded_etags
+                batch = []
+
+                for version in tqdm(versions, desc=object_path, leave=False):
+                    etag = str(version.metadata.get("ETag", "")).strip('"')
+                    file_name = version.metadata.get("fileName")
+
+                    try:
+                        if etag and etag not in missing_etags:
+                            total_skipped += 1
+                            details["skipped"].append({
+                                "qc_path": object_path,
+                                "etag": etag,
+                                "file_name": file_name,
+                            })
+                            continue
+
+                        fallback_name = file_name or f"{version.uuid or 'version'}_{version.valid_from}.bin"
+                        if store is not None:
+                            if not store.has(etag):
+                                resp = ccdb.download_version(version)
+                                store.put_response(etag, resp)
+                            store.link(etag, os.path.join(out_dir, object_path, fallback_name))
+                        else:
+                            resp = ccdb.download_version(version)
+                            save_response_to_file(resp, os.path.join(out_dir, object_path), fallback_name)
+
+                        local_metadata.append(version.metadata)
+                        batch.append((object_path, version.metadata))
+
+                        total_downloaded += 1
+                        if etag:
+                            downloaded_etags.add(etag)
+                            missing_etags.discard(etag)
+
+                        details["downloaded"].append({
+                            "qc_path": object_path,
+                            "etag": etag,
+                            "file_name": file_name,
+                        })
 
-                try:
-                    if etag and etag in existing_etags:
-                        total_skipped += 1
-                        details["skipped"].append({
+                    except Exception as err:
+                        total_failed += 1
+                        logger.error("Failed downloading version %s: %s", version, err)
+                        details["failed"].append({
                             "qc_path": object_path,
                             "etag": etag,
                             "file_name": file_name,
+                            "error": str(err),
                         })
-                        continue
-
-                    resp = ccdb.download_version(version)
-                    fallback_name = file_name or f"{version.uuid or 'version'}_{version.valid_from}.bin"
-
-                    local_metadata.append(version.metadata)
-                    batch.append((object_path, version.metadata))
-
-                    total_downloaded += 1
-                    if etag:
-                        existing_etags.add(etag)
-
-                    details["downloaded"].append({
-                        "qc_path": object_path,
-                        "etag": etag,
-                        "file_name": file_name,
-                    })
-
-                except Exception as err:
-                    total_failed += 1
-                    logger.error("Failed downloading version %s: %s", version, err)
-                    details["failed"].append({
-                        "qc_path": object_path,
-                        "etag": etag,
-                        "file_name": file_name,
-                        "error": str(err),
-                    })
+
+                save_batch_to_postgres(conn, batch)
+                if limit_versions and n_versions >= limit_versions:
+                    break
+
+            logger.info("Found %d versions under %s", n_versions, object_path)
 
             if local_metadata:
                 save_json_to_file_flat(local_metadata, out_dir, object_path)
-                save_batch_to_postgres(conn, batch)
 
         except Exception as err:
             total_failed += 1
@@ -374,6 +660,8 @@ def download_objects(
 
     finished_at = datetime.datetime.now()
 
+    details["http"] = ccdb.stats_snapshot(thread=True)
+
     save_sync_run(
         conn=conn,
         qc_prefix=qc_prefix,
@@ -387,13 +675,47 @@ def download_objects(
     )
 
     logger.info(
-        "Finished: downloaded=%d skipped_existing=%d failed=%d",
+        "Finished: downloaded=%d skipped_existing=%d failed=%d http_requests=%d http_retries=%d",
         total_downloaded,
         total_skipped,
         total_failed,
+        details["http"]["requests"],
+        details["http"]["retries"],
     )
 
 
+def sync_prefix(ccdb: Ccdb, qc_prefix: str, pg_pool=None, **kwargs):
+    """download_objects for one prefix on a connection borrowed from the pool."""
+    conn = pg_pool.getconn() if pg_pool is not None else None
+    try:
+        download_objects(ccdb=ccdb, qc_prefix=qc_prefix, conn=conn, **kwargs)
+    finally:
+        if conn is not None:
+            conn.rollback()
+            pg_pool.putconn(conn)
+
+
+def sync_prefixes(ccdb: Ccdb, qc_prefixes: List[str], max_parallel: int = 4, pg_pool=None, **kwargs) -> List[str]:
+    """
+    Sync the prefixes concurrently, at most `max_parallel` at a time, sharing the
+    HTTP connection pool of `ccdb` and the Postgres pool. Each prefix records its
+    own qcdb_sync_runs row. Returns the prefixes that failed.
+    """
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        futures = {
+            pool.submit(sync_prefix, ccdb, qc_prefix, pg_pool, **kwargs): qc_prefix
+            for qc_prefix in qc_prefixes
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as err:
+                logger.error("Failed syncing prefix %s: %s", futures[future], err)
+                failed.append(futures[future])
+    return failed
+
+
 if __name__ == "__main__":
     with open("config.json") as f:
         config = json.load(f)
@@ -404,6 +726,12 @@ if __name__ == "__main__":
     PG_CONN_STR = os.getenv("PG_CONN_STR")
     LIMIT = int(os.getenv("LIMIT", "10"))
     OUT_DIR = str(os.getenv("OUT_DIR"))
+    OBJECT_STORE_DIR = os.getenv("OBJECT_STORE_DIR", os.path.join(OUT_DIR, "objects"))
+    POOL_SIZE = int(os.getenv("POOL_SIZE", "10"))
+    MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+    LISTING_CACHE_DIR = os.getenv("LISTING_CACHE_DIR", os.path.join(OUT_DIR, ".listing_cache"))
+    LISTING_CACHE_TTL_S = float(os.getenv("LISTING_CACHE_TTL_S", "300"))
+    LISTING_CACHE_MAX_BYTES = int(os.getenv("LISTING_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
 
     BASE = "http://ali-qcdb-gpn.cern.ch:8083"
     QC_PREFIXES = config.get("qc_prefixes", [])
@@ -411,27 +739,39 @@ if __name__ == "__main__":
     HOURS_BACK = int(config.get("hours_back", 24))
     LIMIT_OBJECTS = config.get("limit_objects")
     LIMIT_VERSIONS = config.get("limit_versions")
+    MAX_PARALLEL_PREFIXES = int(config.get("max_parallel_prefixes", 4))
+    # since_ms is rounded down so that consecutive syncs send the same If-Not-Before and
+    # hit the listing cache; the wider window is harmless, known ETags are skipped
+    SINCE_GRANULARITY_S = int(config.get("since_granularity_s", 3600))
 
     since_ms = None if FULL_BACKUP else ms_since_hours_ago(HOURS_BACK)
+    if since_ms is not None and SINCE_GRANULARITY_S > 0:
+        since_ms -= since_ms % (SINCE_GRANULARITY_S * 1000)
 
-    ccdb = Ccdb(BASE, timeout=TIMEOUT)
+    listing_cache = ListingCache(LISTING_CACHE_DIR, ttl_s=LISTING_CACHE_TTL_S, max_bytes=LISTING_CACHE_MAX_BYTES)
+    ccdb = Ccdb(BASE, timeout=TIMEOUT, listing_cache=listing_cache, pool_size=max(POOL_SIZE, MAX_PARALLEL_PREFIXES), max_retries=MAX_RETRIES)
+    store = ObjectStore(OBJECT_STORE_DIR)
 
-    conn = get_pg_conn(USE_POSTGRES, PG_CONN_STR)
-    if conn:
+    pg_pool = get_pg_pool(USE_POSTGRES, PG_CONN_STR, max_connections=MAX_PARALLEL_PREFIXES)
+    if pg_pool:
+        conn = pg_pool.getconn()
         init_db(conn)
+        pg_pool.putconn(conn)
 
     try:
-        for qc_prefix in QC_PREFIXES:
-            download_objects(
-                ccdb=ccdb,
-                qc_prefix=qc_prefix,
-                out_dir=OUT_DIR,
-                since_ms=since_ms,
-                conn=conn,
-                limit_objects=LIMIT_OBJECTS,
-                limit_versions=LIMIT_VERSIONS,
-            )
+        failed_prefixes = sync_prefixes(
+            ccdb=ccdb,
+            qc_prefixes=QC_PREFIXES,
+            max_parallel=MAX_PARALLEL_PREFIXES,
+            pg_pool=pg_pool,
+            out_dir=OUT_DIR,
+            since_ms=since_ms,
+            limit_objects=LIMIT_OBJECTS,
+            limit_versions=LIMIT_VERSIONS,
+            store=store,
+        )
+        logger.info("Synced %d/%d prefixes, HTTP: %s", len(QC_PREFIXES) - len(failed_prefixes), len(QC_PREFIXES), ccdb.stats_snapshot())
     finally:
-        if conn:
-            conn.close()
-            
+        logger.info("Listing cache: %s", listing_cache.stats)
+        if pg_pool:
+            pg_pool.closeall()
@@ -0,0 +1,79 @@
+import os
+import json
+from typing import Any, Dict, List, Optional
+
+
+class ConversionManifest:
+    """
+    Persistent record of which ROOT files were already converted, kept beside the
+    destination folder (`<dest_folder>.manifest.json`).
+
+    Each entry is keyed by the source file name and stores the source size/mtime,
+    the conversion parameters and the produced output paths. A file is skipped on
+    the next run when none of these changed and all its outputs still exist.
+
+    Conversions record their results as they come in and call save_if_due(), so an
+    interrupted run keeps (at most SAVE_EVERY files short of) what it converted.
+    """
+
+    VERSION = 1
+    SAVE_EVERY = 100
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.n_unsaved = 0
+
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.entries = data.get("entries", {})
+
+    @staticmethod
+    def default_path(dest_folder: str) -> str:
+        return os.path.normpath(dest_folder) + ".manifest.json"
+
+    @classmethod
+    def for_dest_folder(cls, dest_folder: str) -> "ConversionManifest":
+        return cls(cls.default_path(dest_folder))
+
+    @staticmethod
+    def source_signature(src_path: str) -> Dict[str, int]:
+        st = os.stat(src_path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def is_up_to_date(self, src_path: str, params: Dict[str, Any]) -> bool:
+        entry = self.entries.get(os.path.basename(src_path))
+        if entry is None:
+            return False
+        if entry["source"] != self.source_signature(src_path) or entry["params"] != params:
+            return False
+        return all(os.path.isfile(p) for p in entry["outputs"])
+
+    def record(self, src_path: str, params: Dict[str, Any], outputs: List[str]):
+        self.entries[os.path.basename(src_path)] = {
+            "source": self.source_signature(src_path),
+            "params": params,
+            "outputs": list(outputs),
+        }
+        self.n_unsaved += 1
+
+    def save_if_due(self) -> bool:
+        """Save once SAVE_EVERY records were added since the last save. Returns whether it saved."""
+        if self.n_unsaved < self.SAVE_EVERY:
+            return False
+        self.save()
+        return True
+
+    def pending(self, src_folder: str, filenames: List[str], params: Dict[str, Any]) -> List[str]:
+        """Return the file names that are new or changed under `params`."""
+        return [fn for fn in filenames if not self.is_up_to_date(os.path.join(src_folder, fn), params)]
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "entries": self.entries}, f)
+        os.replace(tmp_path, path) # never leave a half-written manifest behind
+        self.n_unsaved = 0
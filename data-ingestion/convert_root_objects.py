@@ -0,0 +1,157 @@
+"""
+Single-pass conversion of QCDB ROOT objects: every file is opened once, its
+ccdb_object canvas is walked once (root_readers.read_ccdb_canvas) and any subset of
+    "tensor"    <dest_folder>/tensors/<name>.npz    (N, H, W) TH2 arrays of the first two pads
+    "image"     <dest_folder>/images/<name>_<pad>.png  rendered with the NumPy rasterizer
+    "metadata"  <dest_folder>/metadata.json         quality values / text lines / histogram shapes
+is produced from that single traversal.
+"""
+import os
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+from PIL import Image
+from tqdm.auto import tqdm
+
+from conversion_manifest import ConversionManifest
+from quality_summary_index import parse_quality_summary_lines
+from render import kbird_palette, render_th2
+from root_readers import read_ccdb_canvas
+from utils import save_npz_deterministic
+
+logger = logging.getLogger(__name__)
+
+OUTPUTS = ("tensor", "image", "metadata")
+
+
+def convert_root_file(ROOT_FILES_PATH: str, root_filename: str, dest_folder: str,
+                      outputs: Sequence[str] = OUTPUTS, grey_scale: bool = True,
+                      W: int = 330, H: int = 330, backend: str = "auto") -> Dict[str, Any]:
+    """Produce the requested outputs of one file. Never raises: errors are returned in the entry."""
+    entry = {"file": root_filename, "outputs": [], "metadata": None, "error": None}
+    name = root_filename[:-5]
+    try:
+        primitives = read_ccdb_canvas(os.path.join(ROOT_FILES_PATH, root_filename), backend=backend)
+        pads = primitives[:2] # Because we know that the 3rd and 4rth pad are the histograms
+
+        if "tensor" in outputs:
+            tensors = [h for pad in pads for h in pad.histograms]
+            if tensors:
+                out_path = os.path.join(dest_folder, "tensors", f"{name}.npz")
+                save_npz_deterministic(out_path, data=np.stack(tensors))
+                entry["outputs"].append(out_path)
+
+        if "image" in outputs:
+            palette = kbird_palette()
+            for i, pad in enumerate(pads):
+                if pad.histograms:
+                    out_path = os.path.join(dest_folder, "images", f"{name}_{i}.png")
+                    Image.fromarray(render_th2(pad.histograms[0], W, H, grey_scale, palette)).save(out_path)
+                    entry["outputs"].append(out_path)
+
+        if "metadata" in outputs:
+            lines = [line for prim in primitives for line in prim.lines]
+            entry["metadata"] = {
+                "primitives": [prim.class_name for prim in primitives],
+                "histogram_shapes": [[list(h.shape) for h in prim.histograms] for prim in primitives],
+                "lines": lines,
+                "qualities": parse_quality_summary_lines(lines),
+            }
+
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    return entry
+
+
+def convert_root_files(ROOT_FILES_PATH: str, dest_folder: str, outputs: Sequence[str] = OUTPUTS,
+                       grey_scale: bool = True, W: int = 330, H: int = 330, backend: str = "auto",
+                       n_workers: int = 1, incremental: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    One conversion entry point replacing separate convert_root_files_to_tensors /
+    convert_root_files_to_img / load_quality_summ_from_root_objects passes.
+
+    Returns {"succeeded": [...], "failed": [...]}, also written to <dest_folder>/conversion_manifest.json.
+    """
+    unknown = set(outputs) - set(OUTPUTS)
+    if unknown:
+        raise ValueError(f"Unknown outputs {sorted(unknown)}, expected a subset of {OUTPUTS}")
+
+    os.makedirs(dest_folder, exist_ok=True)
+    if "tensor" in outputs:
+        os.makedirs(os.path.join(dest_folder, "tensors"), exist_ok=True)
+    if "image" in outputs:
+        os.makedirs(os.path.join(dest_folder, "images"), exist_ok=True)
+
+    root_filenames = sorted(
+        f for f in os.listdir(ROOT_FILES_PATH)
+        if f.endswith(".root")
+        and os.path.isfile(os.path.join(ROOT_FILES_PATH, f))
+    )
+
+    params = {"kind": "multi", "outputs": sorted(outputs), "pads": [0, 1], "grey_scale": grey_scale, "W": W, "H": H}
+    conversion_manifest = ConversionManifest.for_dest_folder(dest_folder)
+
+    metadata_path = os.path.join(dest_folder, "metadata.json")
+    metadata = {}
+    if "metadata" in outputs and os.path.isfile(metadata_path):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+    if incremental:
+        n_total = len(root_filenames)
+        pending = set(conversion_manifest.pending(ROOT_FILES_PATH, root_filenames, params))
+        # metadata lives in one shared file, also redo files that are missing from it
+        root_filenames = [fn for fn in root_filenames if fn in pending or ("metadata" in outputs and fn not in metadata)]
+        logger.info(f"{n_total - len(root_filenames)}/{n_total} root objects are up to date, converting {len(root_filenames)}.")
+
+    def save_metadata():
+        if "metadata" in outputs:
+            tmp_path = f"{metadata_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(metadata, f)
+            os.replace(tmp_path, metadata_path)
+
+    entries = []
+
+    def collect(e):
+        # recorded as results come in, an interrupted backfill resumes where it stopped
+        entries.append(e)
+        if e["error"] is None:
+            conversion_manifest.record(os.path.join(ROOT_FILES_PATH, e["file"]), params, e["outputs"])
+            if e["metadata"] is not None:
+                metadata[e["file"]] = e["metadata"]
+        if conversion_manifest.n_unsaved >= conversion_manifest.SAVE_EVERY:
+            save_metadata() # before the manifest, which must not claim files missing from it
+            conversion_manifest.save()
+
+    args = (dest_folder, tuple(outputs), grey_scale, W, H, backend)
+    try:
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                futures = [pool.submit(convert_root_file, ROOT_FILES_PATH, fn, *args) for fn in root_filenames]
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Convert root objects."):
+                    collect(future.result())
+        else:
+            for fn in tqdm(root_filenames, total=len(root_filenames), desc="Convert root objects."):
+                collect(convert_root_file(ROOT_FILES_PATH, fn, *args))
+    finally:
+        save_metadata()
+        conversion_manifest.save()
+
+    entries.sort(key=lambda e: e["file"])
+
+    manifest = {
+        "succeeded": [{k: v for k, v in e.items() if k != "metadata"} for e in entries if e["error"] is None],
+        "failed": [{k: v for k, v in e.items() if k != "metadata"} for e in entries if e["error"] is not None],
+    }
+    with open(os.path.join(dest_folder, "conversion_manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    logger.info(f"Converted {len(manifest['succeeded'])}/{len(entries)} root objects ({', '.join(outputs)}), {len(manifest['failed'])} failed.")
+    for e in manifest["failed"]:
+        logger.error(f"Error on file {e['file']}: {e['error']}")
+
+    return manifest
@@ -4,15 +4,8 @@ import ROOT
 import numpy as np
 from typing import Any, List, Tuple
 
+from utils import th2_to_numpy
 
-def th2_to_numpy(th2:Any) -> np.ndarray:
-    nx = th2.GetNbinsX()
-    ny = th2.GetNbinsY()
-    a = np.zeros((ny, nx), dtype=np.float32)  # rows=y, cols=x
-    for ix in range(1, nx+1):
-        for iy in range(1, ny+1):
-            a[iy-1, ix-1] = th2.GetBinContent(ix, iy)
-    return a
 
 def convert_root_files_to_tensors(
         ROOT_FILES_PATH: str,
@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
 import os, sys, re, json, time, pathlib, requests
+import fnmatch
 from urllib.parse import quote
 import pathlib
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
+from metadata_journal import append_records, journal_path
+from stream_convert_from_qcdb import convert_response_to_tensor_store
+from tensor_store import TensorStoreWriter
+
         
 
 def save_response_to_file(resp, outdir, fallback_name="download.bin"):
@@ -22,11 +29,9 @@ def save_response_to_file(resp, outdir, fallback_name="download.bin"):
                 f.write(chunk)
     return dst
 
-def save_json_to_file_flat(data, outdir, ccdb_path):
-    fpath = (Path(outdir) / ccdb_path).with_suffix(".json")
-    fpath.parent.mkdir(parents=True, exist_ok=True)
-    with fpath.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def save_json_to_file_flat(data, outdir, ccdb_path, compress=False):
+    # append-only JSON Lines journal, see metadata_journal.py
+    append_records(journal_path(outdir, ccdb_path, compress), data)
 
 def user_interaction(path, objects):
     user_action_input = input(f"Do you want to download from {path} - (y/n) or 'q' to quit: ")
@@ -63,8 +68,108 @@ def user_interaction(path, objects):
     return action, limit if 'limit' in locals() else None
 
 
-def browse(QC_PATH, QCDB_ENDPOINT, OUT_DIR, TIMEOUT):
-    """Return (subdirs, objects) for QCDB /browse/<path>."""
+def download_leaf_objects(sess, BASE, path, objects, OUT_DIR, TIMEOUT, MAX_IN_FLIGHT=8, writer=None, KEEP_RAW=True):
+    """
+    Download the objects of one leaf path with up to MAX_IN_FLIGHT concurrent requests
+    on the shared session. Files land in OUT_DIR/<path>/ as before; the metadata
+    JSON of the leaf (objects with a fileName) is written once at the end, in listing order.
+
+    A failed object is reported and skipped, the other downloads go on. An object that
+    was downloaded but could not be converted to the tensor store still counts as
+    downloaded (and is in the metadata); it is reported with stage "conversion".
+    Returns (downloaded objects, [{"fileName", "ETag", "stage", "error"}] of the failed ones).
+    """
+    HEADERS_BIN  = {}  # CCDB will set content headers on the response
+    download_base_url = f"{BASE}/download/"
+
+    def fetch(obj):
+        etag = obj['ETag'].strip('"')
+        url = os.path.join(download_base_url, etag)
+        download = sess.get(url, headers=HEADERS_BIN, timeout=TIMEOUT)
+        download.raise_for_status()
+
+        if obj['fileName'] and writer is None:
+            save_response_to_file(download, os.path.join(OUT_DIR, path), fallback_name=obj['fileName'])
+        return download
+
+    done = [False] * len(objects)
+    failed = []
+
+    def report_failure(obj, stage, e):
+        print(f"Failed {stage} of {obj.get('fileName')} (ETag: {obj.get('ETag')}): {e}")
+        failed.append({"fileName": obj.get('fileName'), "ETag": obj.get('ETag'), "stage": stage,
+                       "error": f"{type(e).__name__}: {e}"})
+    pool = ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT)
+    try:
+        futures = {pool.submit(fetch, obj): i for i, obj in enumerate(objects)}
+        for future in tqdm(as_completed(futures), total=len(futures), desc=path):
+            i = futures[future]
+            try:
+                download = future.result()
+            except Exception as e:
+                report_failure(objects[i], "download", e)
+                continue
+            done[i] = True
+
+            if objects[i]['fileName'] and writer is not None:
+                try:
+                    # conversion stays on this thread, the tensor store writer is not thread-safe
+                    convert_response_to_tensor_store(download, writer, objects[i]['fileName'],
+                                                     run_number=objects[i].get('RunNumber'),
+                                                     raw_dir=os.path.join(OUT_DIR, path) if KEEP_RAW else None)
+                except Exception as e:
+                    report_failure(objects[i], "conversion", e)
+    except BaseException:
+        # aborted (ex. Ctrl+C): drop the downloads that did not start yet
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        pool.shutdown(wait=True)
+        # Save metadata of what was downloaded to a JSON file, once per leaf
+        downloaded = [obj for obj, ok in zip(objects, done) if ok and obj['fileName']]
+        if downloaded:
+            save_json_to_file_flat(downloaded, OUT_DIR, path)
+
+    if failed:
+        print(f"{len(failed)}/{len(objects)} objects of {path} failed (download or conversion).")
+    return downloaded, failed
+
+
+def make_session(MAX_IN_FLIGHT=8):
+    """requests.Session whose connection pool holds MAX_IN_FLIGHT keep-alive connections per host."""
+    sess = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_IN_FLIGHT)
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
+    return sess
+
+
+def list_path(sess, BASE, path, TIMEOUT):
+    """JSON listing of QCDB /browse/<path>: {"subfolders": [...], "objects": [...]}."""
+    r = sess.get(f"{BASE}/browse/{quote(path)}", headers={"Accept": "application/json"}, timeout=TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
+
+def browse(QC_PATH, QCDB_ENDPOINT, OUT_DIR, TIMEOUT, TENSOR_STORE_DIR=None, KEEP_RAW=True, MAX_IN_FLIGHT=8, sess=None,
+           writer=None):
+    """
+    Return (subdirs, objects) for QCDB /browse/<path>.
+
+    The objects of a leaf are downloaded with up to MAX_IN_FLIGHT concurrent requests.
+    With TENSOR_STORE_DIR, every downloaded object is converted in memory and
+    appended to the tensor store there (see stream_convert_from_qcdb); the raw
+    ROOT file is then only written under OUT_DIR if KEEP_RAW. The top-level call
+    opens one TensorStoreWriter for the whole walk, so the leaves share its shards.
+    """
+    if TENSOR_STORE_DIR and writer is None:
+        writer = TensorStoreWriter(TENSOR_STORE_DIR)
+        try:
+            return browse(QC_PATH, QCDB_ENDPOINT, OUT_DIR, TIMEOUT, TENSOR_STORE_DIR, KEEP_RAW, MAX_IN_FLIGHT, sess,
+                          writer=writer)
+        finally:
+            writer.close() # index.json is only written on close
+
     path = QC_PATH
     BASE = QCDB_ENDPOINT
     
@@ -74,19 +179,13 @@ def browse(QC_PATH, QCDB_ENDPOINT, OUT_DIR, TIMEOUT):
         "TIMEOUT": TIMEOUT, 
         "DATA": {}}
     
-    sess = requests.Session()
-    HEADERS_JSON = {"Accept": "application/json"}
-    HEADERS_BIN  = {}  # CCDB will set content headers on the response
+    sess = sess or make_session(MAX_IN_FLIGHT) # shared by the whole recursion
 
-
-    url = f"{BASE}/browse/{quote(path)}"
-    r = sess.get(url, headers=HEADERS_JSON, timeout=TIMEOUT)
-    r.raise_for_status()
-    data = r.json()
+    data = list_path(sess, BASE, path, TIMEOUT)
     if data['subfolders']:
         for subfolder in data['subfolders']:
             print("DIR ", os.path.join(path, subfolder))
-            browse(subfolder, BASE, OUT_DIR, TIMEOUT)
+            browse(subfolder, BASE, OUT_DIR, TIMEOUT, TENSOR_STORE_DIR, KEEP_RAW, MAX_IN_FLIGHT, sess, writer)
     else: # update the metadata in the qcdb dict and download files
         qcdb['DATA'].setdefault(path, [])
         action ,limit = user_interaction(path, data['objects'])
@@ -99,32 +198,79 @@ def browse(QC_PATH, QCDB_ENDPOINT, OUT_DIR, TIMEOUT):
             print(f"Limiting download to {limit} objects.")
             data['objects'] = data['objects'][:limit]
 
-        for i, obj in enumerate(tqdm(data['objects'], total=len(data['objects'])), start=0):
-            
-            #print(f"OBJ {i+1}/{len(data['objects'])} in {path}: {obj['fileName']} (ETag: {obj['ETag']})")
-            #print("FILE", os.path.join(path, obj['fileName']))
-            
-            # Update metadata    
-            qcdb['DATA'][path].append(obj)
-            # Download the file
-            download_base_url = f"{BASE}/download/"
-            etag = qcdb['DATA'][path][i]['ETag'].strip('"')
-            url = os.path.join(download_base_url, etag)
-            download = sess.get(url, headers=HEADERS_BIN, timeout=TIMEOUT)
-            download.raise_for_status()
-            
-            if qcdb['DATA'][path][i]['fileName']:
-                outfile = save_response_to_file(download, os.path.join(OUT_DIR, path), fallback_name=qcdb['DATA'][path][i]['fileName'])
-            #print("Saved:", outfile)
-            
-            # Save metadata to a JSON file
-                save_json_to_file_flat(qcdb['DATA'][path], OUT_DIR, path)
-            else: 
-                continue
+        qcdb['DATA'][path], _ = download_leaf_objects(sess, BASE, path, data['objects'], OUT_DIR, TIMEOUT,
+                                                      MAX_IN_FLIGHT=MAX_IN_FLIGHT, writer=writer, KEEP_RAW=KEEP_RAW)
         
     return True
 
 
+def path_matches(path, include=None, exclude=None):
+    """fnmatch-style filters on the full object path, ex. include=["*/c_Sides_N_Clusters"]."""
+    if include and not any(fnmatch.fnmatch(path, pat) for pat in include):
+        return False
+    return not (exclude and any(fnmatch.fnmatch(path, pat) for pat in exclude))
+
+
+def crawl_plan(PREFIX_SPECS, QCDB_ENDPOINT, TIMEOUT, MAX_IN_FLIGHT=8, sess=None):
+    """
+    Non-interactive replacement of browse()'s walk. PREFIX_SPECS is a list of
+        {"prefix": "qc/TPC/MO/Clusters", "limit": 100, "include": ["*N_Clusters*"], "exclude": ["*/Trending*"]}
+    (only "prefix" is required; "limit" caps the objects per leaf path).
+
+    The subfolders are walked breadth-first, each level listed with up to MAX_IN_FLIGHT
+    concurrent requests over one connection pool. Nothing is downloaded: the returned
+    plan [{"path": leaf_path, "objects": [...]}] can be reviewed, then passed to mirror().
+    """
+    sess = sess or make_session(MAX_IN_FLIGHT)
+    plan = []
+    seen = set()
+
+    frontier = [(spec, spec["prefix"].strip("/")) for spec in PREFIX_SPECS]
+    with ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT) as pool:
+        while frontier:
+            listings = pool.map(lambda item: list_path(sess, QCDB_ENDPOINT, item[1], TIMEOUT), frontier)
+
+            next_frontier = []
+            for (spec, path), data in zip(frontier, listings):
+                if data['subfolders']:
+                    next_frontier.extend((spec, sub) for sub in data['subfolders'])
+                    continue
+
+                if path in seen or not path_matches(path, spec.get("include"), spec.get("exclude")):
+                    continue
+                seen.add(path)
+
+                objects = data['objects']
+                if spec.get("limit"):
+                    objects = objects[:spec["limit"]]
+                plan.append({"path": path, "objects": objects})
+
+            frontier = next_frontier
+
+    print(f"Plan: {len(plan)} paths, {sum(len(p['objects']) for p in plan)} objects.")
+    return plan
+
+
+def mirror(plan, QCDB_ENDPOINT, OUT_DIR, TIMEOUT, MAX_IN_FLIGHT=8, TENSOR_STORE_DIR=None, KEEP_RAW=True, sess=None):
+    """
+    Download every leaf of a crawl_plan() unattended, with the same on-disk layout as browse().
+    Returns {leaf path: failed objects} for the leaves where some downloads failed.
+    """
+    sess = sess or make_session(MAX_IN_FLIGHT)
+    writer = TensorStoreWriter(TENSOR_STORE_DIR) if TENSOR_STORE_DIR else None
+    failures = {}
+    try:
+        for leaf in plan:
+            _, failed = download_leaf_objects(sess, QCDB_ENDPOINT, leaf["path"], leaf["objects"], OUT_DIR, TIMEOUT,
+                                              MAX_IN_FLIGHT=MAX_IN_FLIGHT, writer=writer, KEEP_RAW=KEEP_RAW)
+            if failed:
+                failures[leaf["path"]] = failed
+    finally:
+        if writer is not None:
+            writer.close()
+    return failures
+
+
 if __name__ == '__main__': 
     
     # ------------ EXAMPLE USAGE ------------
@@ -134,5 +280,12 @@ if __name__ == '__main__':
     OUT_DIR   = "./qcdb_data_auto"                          # where to save files
     TIMEOUT   = 60
 
-    browse(QC_PATH=QC_PREFIX, QCDB_ENDPOINT=BASE, OUT_DIR=OUT_DIR, TIMEOUT=TIMEOUT)
+    if len(sys.argv) > 1:
+        # unattended: python download_data_from_qcdb.py prefixes.json (a list of prefix specs, see crawl_plan)
+        with open(sys.argv[1], "r") as f:
+            PREFIX_SPECS = json.load(f)
+        plan = crawl_plan(PREFIX_SPECS, QCDB_ENDPOINT=BASE, TIMEOUT=TIMEOUT)
+        mirror(plan, QCDB_ENDPOINT=BASE, OUT_DIR=OUT_DIR, TIMEOUT=TIMEOUT)
+    else:
+        browse(QC_PATH=QC_PREFIX, QCDB_ENDPOINT=BASE, OUT_DIR=OUT_DIR, TIMEOUT=TIMEOUT)
 
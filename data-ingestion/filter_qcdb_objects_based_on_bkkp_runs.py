@@ -4,11 +4,12 @@ import os
 import shutil
 from tqdm import tqdm 
 
+from metadata_journal import strip_journal_suffix, unique_records
+
 def filter_cluster_versions_on_bkkp_runs(BASE_PATH, qcdb_json_data_REL_PATH, bkkp_json_data_REL_PATH, DEST_FILEPATH): 
     
-    # Load the json files 
-    with open(os.path.join(BASE_PATH, qcdb_json_data_REL_PATH), "r") as f: 
-        qcdb_data = json.load(f)
+    # Load the metadata journal (.jsonl / .jsonl.gz, or a legacy .json list) and the json file 
+    qcdb_data = unique_records(os.path.join(BASE_PATH, qcdb_json_data_REL_PATH))
         
     with open(os.path.join(BASE_PATH, bkkp_json_data_REL_PATH) , "r") as bkkpruns: 
         bkkp_good_runs = json.load(bkkpruns)
@@ -36,7 +37,7 @@ def filter_cluster_versions_on_bkkp_runs(BASE_PATH, qcdb_json_data_REL_PATH, bkk
         
         qcdb_object_to_keep = filtered_qcdb_objects['fileName'][i]
         
-        src = os.path.join(BASE_PATH, qcdb_json_data_REL_PATH.removesuffix('.json') , qcdb_object_to_keep)
+        src = os.path.join(BASE_PATH, strip_journal_suffix(qcdb_json_data_REL_PATH) , qcdb_object_to_keep)
         
         shutil.copy(src,os.path.join(DEST_FILEPATH, qcdb_object_to_keep))
         
@@ -44,7 +45,7 @@ def filter_cluster_versions_on_bkkp_runs(BASE_PATH, qcdb_json_data_REL_PATH, bkk
 if __name__ == '__main__': 
     
     BASE_PATH = os.getcwd()
-    qcdb_json_data_REL_PATH = "qcdb_data/qc/TPC/MO/Clusters/c_Sides_N_Clusters.json"
+    qcdb_json_data_REL_PATH = "qcdb_data/qc/TPC/MO/Clusters/c_Sides_N_Clusters.jsonl"
     bkkp_json_data_REL_PATH = "bkkp_data/runs_stable_beams_with_good_tpc_quality.json"
     DEST_FILEPATH = os.path.join(BASE_PATH, os.path.dirname(qcdb_json_data_REL_PATH), "good_qc_filtered_clusters")
 
@@ -2,23 +2,21 @@ import json
 import pandas as pd 
 import os 
 import math, os, sys, re
-try:
-    import ROOT 
-except Exception as e:
-    raise SystemExit("PyROOT import failed. Make sure your kernel uses the env with ROOT installed.\n" + str(e))
-
 from array import array
 import numpy as np
 from tqdm.auto import tqdm 
 import shutil 
 import logging 
 
-from utils import load_json_file_into_df, load_quality_summ_from_root_objects, config_logger
+from metadata_journal import strip_journal_suffix
+from utils import load_json_file_into_df, config_logger
+from quality_summary_index import QualitySummaryIndex
 
 
 logger = config_logger(output_file="output.log")
 
-def filter_mo_based_on_quality_summaries(BASE_PATH, qcdb_mo_json_data_REL_PATH, bkkp_json_data_REL_PATH, qcdb_qs_mo_json_data_REL_PATH, qual_val_pairs, dst): 
+def filter_mo_based_on_quality_summaries(BASE_PATH, qcdb_mo_json_data_REL_PATH, bkkp_json_data_REL_PATH, qcdb_qs_mo_json_data_REL_PATH, qual_val_pairs, dst,
+                                         qsum_root_objects_path=None, n_workers=1): 
     # metadata regards the versions of the objects 
     # an object is a path (ex. qc/TPC/MO/Clusters/c_Sides_N_Clusters), a version is one item in that path
     # mo could be an occupancy map, a cluster map, a graph etc. 
@@ -44,19 +42,16 @@ def filter_mo_based_on_quality_summaries(BASE_PATH, qcdb_mo_json_data_REL_PATH,
     logger.info(f"The total number of runs taken into consideration from api bkkp limit --> {len(bkkp_filtered_runs)}")
 
     # Filter the mo ex. clusters FURTHER by a quality metric of the quality summaries loaded from qcdb 
-    quality_dict = load_quality_summ_from_root_objects(filepath_of_root_objects= os.path.join(os.getcwd(), "data/qcdb_data/qc/TPC/MO/Q_O_physics/QualitySummary/"))
-
-        # Chosen quality metric ex. Raw Occupancy quality is "Good"
-    filtered_quality_summ_obj_names = [
-        key 
-        for key, value in quality_dict.items()
-        if (
-            not qual_val_pairs
-            or all(value.get(q) == exp for q, exp in qual_val_pairs)
-        )
-    ]
+    if qsum_root_objects_path is None:
+        qsum_root_objects_path = os.path.join(os.getcwd(), "data/qcdb_data/qc/TPC/MO/Q_O_physics/QualitySummary/")
+        # Chosen quality metric ex. Raw Occupancy quality is "Good", answered from the index (only new/changed ROOT files are parsed)
+    with QualitySummaryIndex(QualitySummaryIndex.default_path(qsum_root_objects_path)) as qsum_index:
+        qsum_index.refresh(qsum_root_objects_path, n_workers=n_workers)
+        filtered_quality_summ_obj_names = qsum_index.query(qual_val_pairs)
+        n_quality_summaries = len(qsum_index.query([]))
+
         # stats
-    logger.info(  f"{len(filtered_quality_summ_obj_names)}/{len(quality_dict)} quality summaries have the desired quality metrics {qual_val_pairs}")
+    logger.info(  f"{len(filtered_quality_summ_obj_names)}/{n_quality_summaries} quality summaries have the desired quality metrics {qual_val_pairs}")
 
         # However, the Root names are not the same across MOs! 
             # --> We need to correlate these objects with their corresponding Run Number and Creation Time (found on the object metadata)
@@ -92,10 +87,10 @@ def filter_mo_based_on_quality_summaries(BASE_PATH, qcdb_mo_json_data_REL_PATH,
     for _, group_df in tqdm(iterable=concat_mo_with_qsum_mo_group_by_run_number, total = n_groups, desc="Processing run groups"):
         
         mo_path = os.path.join(os.path.dirname(qcdb_mo_json_data_REL_PATH).replace("data/qcdb_data/", ""),
-                                os.path.splitext(os.path.basename(qcdb_mo_json_data_REL_PATH))[0])
+                                strip_journal_suffix(os.path.basename(qcdb_mo_json_data_REL_PATH)))
 
         qsum_path =os.path.join(os.path.dirname(qcdb_qs_mo_json_data_REL_PATH).replace("data/qcdb_data/", ""),
-                                os.path.splitext(os.path.basename(qcdb_qs_mo_json_data_REL_PATH))[0])
+                                strip_journal_suffix(os.path.basename(qcdb_qs_mo_json_data_REL_PATH)))
         
         num_mo_objects = group_df.path.value_counts()[mo_path]
         num_qsum_mo_objects = group_df.path.value_counts()[qsum_path] 
@@ -133,7 +128,7 @@ def filter_mo_based_on_quality_summaries(BASE_PATH, qcdb_mo_json_data_REL_PATH,
             
                         src = os.path.join(
                             BASE_PATH,
-                            qcdb_mo_json_data_REL_PATH.removesuffix(".json"),
+                            strip_journal_suffix(qcdb_mo_json_data_REL_PATH),
                             cls_filename,
                         )
                         shutil.copy(src, os.path.join(dst, cls_filename))
@@ -153,9 +148,9 @@ if __name__ == '__main__':
     
     logger = config_logger(output_file="output.log")
     BASE_PATH = os.getcwd()
-    qcdb_mo_json_data_REL_PATH = "qcdb_data/qc/TPC/MO/Clusters/c_Sides_N_Clusters.json"
+    qcdb_mo_json_data_REL_PATH = "qcdb_data/qc/TPC/MO/Clusters/c_Sides_N_Clusters.jsonl"
     bkkp_json_data_REL_PATH = "bkkp_data/runs_stable_beams_with_good_tpc_quality.json"
-    qcdb_qs_mo_json_data_REL_PATH = "qcdb_data/qc/TPC/MO/Q_O_physics/QualitySummary.json"
+    qcdb_qs_mo_json_data_REL_PATH = "qcdb_data/qc/TPC/MO/Q_O_physics/QualitySummary.jsonl"
     dest_folder = os.path.join(BASE_PATH, os.path.dirname(qcdb_mo_json_data_REL_PATH), "filtered_clusters")
 
     # qual_val_pairs = [("Raw occupancy quality","Good"), ("Cluster occupancy quality","Bad")]
@@ -0,0 +1,110 @@
+"""
+Append-only JSON Lines journal of the QCDB object metadata, one file per MO path:
+
+    <outdir>/<ccdb path>.jsonl       (or .jsonl.gz)
+
+Each download appends its records instead of rewriting the whole metadata list,
+readers stream the file line by line, and `compact` (also `python metadata_journal.py <dir>`)
+drops the records repeated by re-downloads, keeping the last one per ETag.
+Readers that must not see those repeats use `unique_records` (or dedupe the same way).
+"""
+import gzip
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+JOURNAL_SUFFIXES = (".jsonl.gz", ".jsonl")
+
+
+def journal_path(outdir: str, ccdb_path: str, compress: bool = False) -> Path:
+    return (Path(outdir) / ccdb_path).with_suffix(".jsonl.gz" if compress else ".jsonl")
+
+
+def strip_journal_suffix(fpath: str) -> str:
+    """The MO path / object folder of a metadata file: ".../c_Sides_N_Clusters.jsonl.gz" -> ".../c_Sides_N_Clusters"."""
+    for suffix in JOURNAL_SUFFIXES + (".json",):
+        if fpath.endswith(suffix):
+            return fpath[:-len(suffix)]
+    return fpath
+
+
+def _open(fpath, mode: str):
+    if str(fpath).endswith(".gz"):
+        # appending to a gzip file adds a new member, gzip readers handle concatenated members
+        return gzip.open(fpath, mode + "t", encoding="utf-8")
+    return open(fpath, mode, encoding="utf-8")
+
+
+def append_records(fpath, records: Iterable[Dict]) -> int:
+    fpath = Path(fpath)
+    fpath.parent.mkdir(parents=True, exist_ok=True)
+    lines = [json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n" for rec in records]
+    if lines:
+        with _open(fpath, "a") as f:
+            f.writelines(lines)
+    return len(lines)
+
+
+def iter_records(fpath) -> Iterator[Dict]:
+    """Records of a journal, streamed; a legacy .json file (one JSON list) is read whole."""
+    if str(fpath).endswith(".json"):
+        with open(fpath, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+
+    with _open(fpath, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _record_key(rec: Dict, key: str) -> Optional[str]:
+    value = rec.get(key)
+    return str(value).strip('"') if value else None
+
+
+def _latest_records(fpath, key: str):
+    """(number of records, [last record per `key`] in journal order); records without `key` are all kept."""
+    latest = {}
+    n_in = 0
+    for i, rec in enumerate(iter_records(fpath)):
+        n_in += 1
+        k = _record_key(rec, key)
+        latest[k if k is not None else f"#{i}"] = (i, rec)
+    return n_in, [rec for _, rec in sorted(latest.values(), key=lambda x: x[0])]
+
+
+def unique_records(fpath, key: str = "ETag") -> List[Dict]:
+    """Records of a journal without the repeats of re-downloads: what `compact` would keep."""
+    return _latest_records(fpath, key)[1]
+
+
+def compact(fpath, key: str = "ETag") -> Dict[str, int]:
+    """Rewrite a journal keeping the last record per `key` (records without it are kept), atomically."""
+    fpath = Path(fpath)
+    n_in, kept = _latest_records(fpath, key)
+
+    tmp = fpath.with_name(".compact-" + fpath.name)  # same suffix, same compression
+    with _open(tmp, "w") as f:
+        for rec in kept:
+            f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+    os.replace(tmp, fpath)
+    return {"records": n_in, "kept": len(kept)}
+
+
+def compact_tree(outdir: str, key: str = "ETag") -> Dict[str, int]:
+    stats = {"journals": 0, "records": 0, "kept": 0}
+    for dirpath, _, filenames in os.walk(outdir):
+        for fn in filenames:
+            if fn.endswith(JOURNAL_SUFFIXES):
+                res = compact(os.path.join(dirpath, fn), key=key)
+                stats["journals"] += 1
+                stats["records"] += res["records"]
+                stats["kept"] += res["kept"]
+    return stats
+
+
+if __name__ == "__main__":
+    print(compact_tree(sys.argv[1]))
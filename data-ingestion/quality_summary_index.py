@@ -0,0 +1,162 @@
+import os
+import re
+import sqlite3
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from tqdm.auto import tqdm
+
+from root_readers import read_ccdb_canvas
+
+logger = logging.getLogger(__name__)
+
+
+def parse_quality_summary_lines(lines: List[str]) -> Dict[str, str]:
+    """
+    Turn the TLatex lines of a QualitySummary TPaveText, ex. "#color[418]{Raw occupancy quality: Good}",
+    into {"Raw occupancy quality": "Good", ...}.
+    """
+    qualities = {}
+    for text in lines:
+        match_obj = re.search(r"\{([^}]*)\}", text)
+        if not match_obj:
+            continue
+        match_text = match_obj.group(1)
+
+        # split in key-value pairs to save in a json file
+        if ":" in match_text:
+            key, value = [s.strip() for s in match_text.split(":",1)]
+            qualities[key] = value
+    return qualities
+
+
+def parse_quality_summary_file(fpath: str, backend: str = "auto") -> Tuple[str, int, int, Dict[str, str], Optional[str]]:
+    """(file_name, size, mtime_ns, qualities, error) for one QualitySummary ROOT file."""
+    st = os.stat(fpath)
+    try:
+        primitives = read_ccdb_canvas(fpath, backend=backend)
+        # it will always have one object (TPaveText of TLatex lines) in the quality summaries case
+        qualities = parse_quality_summary_lines(primitives[0].lines) if primitives else {}
+        error = None
+    except Exception as e:
+        qualities, error = {}, f"{type(e).__name__}: {e}"
+    return os.path.basename(fpath), st.st_size, st.st_mtime_ns, qualities, error
+
+
+class QualitySummaryIndex:
+    """
+    SQLite index of the quality values extracted from QualitySummary ROOT objects,
+    keyed by file name and validated by size/mtime, so the ROOT files are parsed once
+    and filters like "Raw occupancy quality == Good" are plain SQL queries.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS quality_summary_files (
+                file_name   TEXT PRIMARY KEY,
+                size        INTEGER NOT NULL,
+                mtime_ns    INTEGER NOT NULL,
+                error       TEXT
+            );
+            CREATE TABLE IF NOT EXISTS quality_summary_values (
+                file_name   TEXT NOT NULL REFERENCES quality_summary_files(file_name) ON DELETE CASCADE,
+                quality     TEXT NOT NULL,
+                value       TEXT NOT NULL,
+                PRIMARY KEY (file_name, quality)
+            );
+            CREATE INDEX IF NOT EXISTS idx_quality_summary_values_quality_value
+            ON quality_summary_values (quality, value);
+        """)
+        self.conn.execute("PRAGMA foreign_keys = ON;")
+
+    @staticmethod
+    def default_path(filepath_of_root_objects: str) -> str:
+        return os.path.normpath(filepath_of_root_objects) + ".quality_index.sqlite"
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def refresh(self, filepath_of_root_objects: str, n_workers: int = 1, backend: str = "auto") -> Dict[str, int]:
+        """Parse the new, changed or previously failed files of the folder (in a process pool if n_workers > 1) and drop removed ones."""
+        on_disk = {}
+        for fn in os.listdir(filepath_of_root_objects):
+            fpath = os.path.join(filepath_of_root_objects, fn)
+            if fn.endswith(".root") and os.path.isfile(fpath):
+                st = os.stat(fpath)
+                on_disk[fn] = (st.st_size, st.st_mtime_ns)
+
+        indexed = {fn: (size, mtime_ns) for fn, size, mtime_ns in
+                   self.conn.execute("SELECT file_name, size, mtime_ns FROM quality_summary_files;")}
+        # files whose last parse failed are never up to date, they are parsed again on every refresh
+        failed_before = {fn for (fn,) in
+                         self.conn.execute("SELECT file_name FROM quality_summary_files WHERE error IS NOT NULL;")}
+
+        removed = [fn for fn in indexed if fn not in on_disk]
+        todo = sorted(fn for fn, sig in on_disk.items() if indexed.get(fn) != sig or fn in failed_before)
+
+        parse = partial(parse_quality_summary_file, backend=backend)
+        fpaths = [os.path.join(filepath_of_root_objects, fn) for fn in todo]
+
+        failed = 0
+        with self.conn:
+            self.conn.executemany("DELETE FROM quality_summary_files WHERE file_name = ?;", [(fn,) for fn in removed])
+
+            pool = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 and fpaths else None
+            try:
+                results = pool.map(parse, fpaths, chunksize=32) if pool else map(parse, fpaths)
+                for file_name, size, mtime_ns, qualities, error in tqdm(results, total=len(fpaths), desc="Index quality summaries"):
+                    if error is not None:
+                        failed += 1
+                        logger.error(f"Extracting quality summary from root object: {file_name}, with error: {error}")
+
+                    self.conn.execute("DELETE FROM quality_summary_files WHERE file_name = ?;", (file_name,))
+                    self.conn.execute(
+                        "INSERT INTO quality_summary_files (file_name, size, mtime_ns, error) VALUES (?, ?, ?, ?);",
+                        (file_name, size, mtime_ns, error),
+                    )
+                    self.conn.executemany(
+                        "INSERT INTO quality_summary_values (file_name, quality, value) VALUES (?, ?, ?);",
+                        [(file_name, k, v) for k, v in qualities.items()],
+                    )
+            finally:
+                if pool:
+                    pool.shutdown()
+
+        stats = {"parsed": len(todo), "unchanged": len(on_disk) - len(todo), "removed": len(removed), "failed": failed}
+        logger.info(f"Quality summary index {self.db_path}: {stats}")
+        return stats
+
+    def query(self, qual_val_pairs: List[Tuple[str, str]]) -> List[str]:
+        """File names whose quality summary has all the (quality, value) pairs (any summary if no pairs)."""
+        sql = """
+            SELECT f.file_name
+            FROM quality_summary_files f
+            WHERE EXISTS (SELECT 1 FROM quality_summary_values v WHERE v.file_name = f.file_name)
+        """
+        params = []
+        for quality, value in qual_val_pairs:
+            sql += """
+              AND EXISTS (SELECT 1 FROM quality_summary_values v
+                          WHERE v.file_name = f.file_name AND v.quality = ? AND v.value = ?)
+            """
+            params += [quality, value]
+        return [row[0] for row in self.conn.execute(sql + " ORDER BY f.file_name;", params)]
+
+    def as_dict(self) -> Dict[str, Dict[str, str]]:
+        """{file_name: {quality: value}}, the format of load_quality_summ_from_root_objects."""
+        quality_dict = {}
+        for file_name, quality, value in self.conn.execute(
+            "SELECT file_name, quality, value FROM quality_summary_values ORDER BY file_name;"
+        ):
+            quality_dict.setdefault(file_name, {})[quality] = value
+        return quality_dict
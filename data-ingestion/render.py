@@ -0,0 +1,114 @@
+"""
+NumPy rasterizer for TH2 bin arrays: produces the same kind of W×H image as
+convert_root_files_to_img (TH2 drawn with "COL" on a margin-less pad, default
+kBird palette, linear z scale) without going through TCanvas/TImage and PNG.
+"""
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+
+from root_readers import read_ccdb_canvas
+
+
+# ROOT's default palette (kBird, TColor::SetPalette(57)): 9 stops interpolated to 255 colours
+KBIRD_STOPS = [0.0000, 0.1250, 0.2500, 0.3750, 0.5000, 0.6250, 0.7500, 0.8750, 1.0000]
+KBIRD_RED   = [0.2082, 0.0592, 0.0780, 0.0232, 0.1802, 0.5301, 0.8186, 0.9956, 0.9764]
+KBIRD_GREEN = [0.1664, 0.3599, 0.5041, 0.6419, 0.7178, 0.7492, 0.7328, 0.7862, 0.9832]
+KBIRD_BLUE  = [0.5293, 0.8684, 0.8385, 0.7914, 0.6425, 0.4662, 0.3499, 0.1968, 0.0539]
+
+N_CONTOURS = 20  # gStyle->GetNumberContours() default, "COL" quantizes z into this many levels
+
+
+def kbird_palette(n_colors: int = 255) -> np.ndarray:
+    """(n_colors, 3) uint8 table, like TColor::CreateGradientColorTable."""
+    x = np.linspace(0.0, 1.0, n_colors)
+    rgb = np.stack([np.interp(x, KBIRD_STOPS, c) for c in (KBIRD_RED, KBIRD_GREEN, KBIRD_BLUE)], axis=1)
+    return np.round(rgb * 255).astype(np.uint8)
+
+
+def th2_color_indices(a: np.ndarray, n_contours: int = N_CONTOURS, n_colors: int = 255) -> np.ndarray:
+    """
+    Palette index of every bin as THistPainter::PaintColorLevels computes it,
+    -1 for bins that "COL" leaves unpainted (empty bins of a non-negative histogram).
+    """
+    zmin, zmax = float(a.min()), float(a.max())
+    scale = n_contours / (zmax - zmin) if zmax > zmin else 0.0
+
+    level = (0.01 + (a - zmin) * scale).astype(np.int64)
+    idx = ((level + 0.99) * n_colors / n_contours).astype(np.int64)
+    idx = np.clip(idx, 0, n_colors - 1)
+    idx[a >= zmax] = n_colors - 1
+
+    if zmin >= 0:
+        idx[a == 0] = -1
+    return idx
+
+
+def render_th2(a: np.ndarray, W: int = 330, H: int = 330, grey_scale: bool = True,
+               palette: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Rasterize one (ny, nx) bin array (rows=y, as returned by th2_to_numpy) to
+    a (H, W) uint8 grey image or a (H, W, 3) uint8 RGB image. Bins are mapped to
+    pixels by nearest neighbour with y increasing upwards, unpainted bins are white.
+    """
+    palette = kbird_palette() if palette is None else palette
+    ny, nx = a.shape
+
+    idx = th2_color_indices(a, n_colors=len(palette))
+
+    rows = (ny - 1) - (np.arange(H) * ny // H)  # top pixel row = last y bin
+    cols = np.arange(W) * nx // W
+    pix = idx[np.ix_(rows, cols)]
+
+    rgb = np.full((H, W, 3), 255, dtype=np.uint8)
+    painted = pix >= 0
+    rgb[painted] = palette[pix[painted]]
+
+    if not grey_scale:
+        return rgb
+    # same weights as libAfterImage's grey conversion used by TImage::Gray
+    r, g, b = (rgb[..., k].astype(np.uint32) for k in range(3))
+    return ((57 * r + 181 * g + 18 * b) >> 8).astype(np.uint8)
+
+
+def render_th2_batch(arrays: List[np.ndarray], W: int = 330, H: int = 330, grey_scale: bool = True) -> np.ndarray:
+    """Stack of render_th2 images: (N, H, W) or (N, H, W, 3)."""
+    palette = kbird_palette()
+    return np.stack([render_th2(a, W, H, grey_scale, palette) for a in arrays])
+
+
+def rasterize_root_files(ROOT_FILES_PATH: str, W: int = 330, H: int = 330, grey_scale: bool = True,
+                         png_folder: Optional[str] = None, backend: str = "auto") -> Dict[str, np.ndarray]:
+    """
+    Image tensors for the first histogram of the first two pads of every ccdb_object,
+    keyed by ROOT file name. PNGs (`<name>_<pad>.png`, as convert_root_files_to_img names them)
+    are only written when `png_folder` is given, for human inspection.
+    Overlays drawn on top of the histogram (TLine, TBox, ...) are not reproduced.
+    """
+    root_filenames = sorted(fn for fn in os.listdir(ROOT_FILES_PATH) if fn.endswith(".root"))
+    if png_folder:
+        os.makedirs(png_folder, exist_ok=True)
+
+    images = {}
+    for root_filename in tqdm(root_filenames, total=len(root_filenames), desc="Rasterize root objects."):
+        try:
+            primitives = read_ccdb_canvas(os.path.join(ROOT_FILES_PATH, root_filename), backend=backend)
+        except Exception as e:
+            print(f"Error on file {root_filename}: {e}")
+            continue
+
+        pads = [(i, pad.histograms[0]) for i, pad in enumerate(primitives[:2]) if pad.histograms]
+        if not pads:
+            continue
+
+        imgs = render_th2_batch([h for _, h in pads], W, H, grey_scale)
+        images[root_filename] = imgs
+
+        if png_folder:
+            for (i, _), img in zip(pads, imgs):
+                Image.fromarray(img).save(os.path.join(png_folder, f"{root_filename[:-5]}_{i}.png"))
+
+    return images
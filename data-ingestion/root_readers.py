@@ -0,0 +1,246 @@
+"""
+Reader layer for the `ccdb_object` TCanvas stored in every QCDB ROOT file.
+
+The canvas is reduced to a list of CanvasPrimitive (one per canvas primitive,
+in draw order) holding only what the ingestion needs: the TH2 bin arrays and the
+text lines of TPaveText boxes (quality summaries).
+
+Backends:
+    "uproot"  pure Python, deserializes the objects from the streamers stored in the file
+    "root"    PyROOT
+    "auto"    uproot when installed, falling back to ROOT if uproot fails on a file
+"""
+import io
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import uproot
+except ImportError:
+    uproot = None
+
+logger = logging.getLogger(__name__)
+
+_ROOT = None
+
+
+def get_root():
+    """Import PyROOT on first use (seconds of startup) and put it in batch mode."""
+    global _ROOT
+    if _ROOT is None:
+        try:
+            import ROOT
+        except Exception as e:
+            raise RuntimeError("PyROOT import failed. Make sure your kernel uses the env with ROOT installed.\n" + str(e))
+        ROOT.gROOT.SetBatch(True)
+        ROOT.gErrorIgnoreLevel = ROOT.kWarning
+        _ROOT = ROOT
+    return _ROOT
+
+
+class CanvasPrimitive:
+    def __init__(self, class_name: str, histograms: Optional[List[np.ndarray]] = None, lines: Optional[List[str]] = None):
+        self.class_name = class_name
+        self.histograms = histograms or []  # TH2 contents as float32 (ny, nx), rows=y, cols=x
+        self.lines = lines or []            # TPaveText lines (for TLatex the text is the title)
+
+    def __repr__(self):
+        shapes = [h.shape for h in self.histograms]
+        return f"CanvasPrimitive(class_name={self.class_name!r}, histograms={shapes}, lines={len(self.lines)})"
+
+
+# ---------------- ROOT backend ----------------
+
+# dtype of the internal bin array (TArrayF, TArrayD, ...) for each TH2 flavour
+TH2_ARRAY_DTYPES = {
+    "TH2F": np.float32,
+    "TH2D": np.float64,
+    "TH2I": np.int32,
+    "TH2S": np.int16,
+    "TH2C": np.int8,
+}
+
+
+def th2_to_numpy_per_bin(th2:Any) -> np.ndarray:
+    """
+    Reference implementation: one GetBinContent call per bin.
+    Slow (one Python->C++ crossing per bin), kept for validation and as fallback.
+    """
+    nx = th2.GetNbinsX()
+    ny = th2.GetNbinsY()
+    a = np.zeros((ny, nx), dtype=np.float32)  # rows=y, cols=x
+    for ix in range(1, nx+1):
+        for iy in range(1, ny+1):
+            a[iy-1, ix-1] = th2.GetBinContent(ix, iy)
+    return a
+
+
+def th2_to_numpy(th2:Any) -> np.ndarray:
+    """
+    Read the TH2 bin contents in one go from the histogram's internal array.
+
+    ROOT stores the bins row-major in y with under/overflow included:
+    global bin = ix + (nx+2)*iy. We view that buffer as (ny+2, nx+2), strip
+    the under/overflow rows/columns and copy once into a float32 (ny, nx) array,
+    i.e. the same layout as th2_to_numpy_per_bin (rows=y, cols=x).
+    """
+    nx = th2.GetNbinsX()
+    ny = th2.GetNbinsY()
+
+    # TProfile2D inherits from TH2D but its array holds the per-bin sums, not the means
+    # GetBinContent returns; it goes through the per-bin path like any other flavour
+    dtype = None if th2.InheritsFrom("TProfile2D") else TH2_ARRAY_DTYPES.get(th2.ClassName())
+    if dtype is None:
+        return th2_to_numpy_per_bin(th2)
+
+    n_cells = (nx + 2) * (ny + 2)
+    buf = th2.GetArray()
+    buf.reshape((n_cells,)) # cppyy returns an unsized view, give it the real length
+    full = np.frombuffer(buf, dtype=dtype, count=n_cells).reshape(ny + 2, nx + 2)
+
+    # copy: the buffer belongs to ROOT and goes away with the TFile
+    return np.array(full[1:ny+1, 1:nx+1], dtype=np.float32)
+
+
+def _is_root_th2(obj) -> bool:
+    # TH2Poly bins are polygons, not a (ny, nx) grid; skipped by both backends
+    return obj.InheritsFrom("TH2") and not obj.InheritsFrom("TH2Poly")
+
+
+def _primitive_from_root(obj) -> CanvasPrimitive:
+    prim = CanvasPrimitive(obj.ClassName())
+    children = obj.GetListOfPrimitives() if obj.InheritsFrom("TPad") else [obj]
+
+    for child in children:
+        if _is_root_th2(child):
+            prim.histograms.append(th2_to_numpy(child))
+        elif child.InheritsFrom("TPaveText"):
+            prim.lines.extend(str(line.GetTitle()) for line in child.GetListOfLines())
+    return prim
+
+
+def _read_root_tfile(f, name: str) -> List[CanvasPrimitive]:
+    if not f or f.IsZombie(): # IsZombie checks if ROOT failed internally
+        raise RuntimeError(f"Failed to open {name}")
+    try:
+        canvas = f.Get("ccdb_object")
+        if not canvas:
+            raise RuntimeError(f"ccdb_object not found in {name}")
+        return [_primitive_from_root(obj) for obj in canvas.GetListOfPrimitives()]
+    finally:
+        f.Close()
+
+
+def read_ccdb_canvas_root(fpath: str) -> List[CanvasPrimitive]:
+    ROOT = get_root()
+    return _read_root_tfile(ROOT.TFile.Open(fpath, "READ"), fpath)
+
+
+def read_ccdb_canvas_root_from_bytes(data: bytes, name: str = "in-memory.root") -> List[CanvasPrimitive]:
+    ROOT = get_root()
+    buffer = bytearray(data) # TMemFile reads from (and must not outlive) this buffer
+    return _read_root_tfile(ROOT.TMemFile(name, buffer, len(buffer), "READ"), name)
+
+
+# ---------------- uproot backend ----------------
+
+def _uproot_members(obj) -> Dict[str, Any]:
+    return getattr(obj, "all_members", {}) or {}
+
+
+def _is_uproot_th2(obj) -> bool:
+    # same histograms as _is_root_th2: TH2 flavours and TProfile2D (values() are the bin means), no TH2Poly
+    return isinstance(obj, (uproot.behaviors.TH2.TH2, uproot.behaviors.TProfile2D.TProfile2D))
+
+
+def _primitive_from_uproot(obj) -> CanvasPrimitive:
+    prim = CanvasPrimitive(obj.classname)
+    members = _uproot_members(obj)
+    children = members["fPrimitives"] if "fPrimitives" in members else [obj]
+
+    for child in children:
+        if _is_uproot_th2(child):
+            # uproot indexes values as [x, y], transpose to rows=y, cols=x
+            prim.histograms.append(np.ascontiguousarray(child.values(flow=False).T, dtype=np.float32))
+        elif "fLines" in _uproot_members(child):
+            prim.lines.extend(str(line.member("fTitle")) for line in child.member("fLines"))
+    return prim
+
+
+def _read_uproot_file(f, name: str) -> List[CanvasPrimitive]:
+    if "ccdb_object" not in f:
+        raise RuntimeError(f"ccdb_object not found in {name}")
+    canvas = f["ccdb_object"]
+    return [_primitive_from_uproot(obj) for obj in canvas.member("fPrimitives")]
+
+
+def read_ccdb_canvas_uproot(fpath: str) -> List[CanvasPrimitive]:
+    if uproot is None:
+        raise RuntimeError("uproot is not installed")
+    with uproot.open(fpath) as f:
+        return _read_uproot_file(f, fpath)
+
+
+def read_ccdb_canvas_uproot_from_bytes(data: bytes, name: str = "in-memory.root") -> List[CanvasPrimitive]:
+    if uproot is None:
+        raise RuntimeError("uproot is not installed")
+    with uproot.open(io.BytesIO(data)) as f:
+        return _read_uproot_file(f, name)
+
+
+# ---------------- tensors ----------------
+
+def th2_tensors_from_primitives(primitives: List[CanvasPrimitive], n_pads: int = 2) -> Optional[np.ndarray]:
+    """Stack the TH2 arrays of the first `n_pads` canvas primitives, None if there is none."""
+    tensors = [h for pad in primitives[:n_pads] for h in pad.histograms]
+    if not tensors:
+        return None
+    return np.stack(tensors)  # (N, H, W)
+
+
+# ---------------- dispatch ----------------
+
+BACKENDS: Dict[str, Callable[[str], List[CanvasPrimitive]]] = {
+    "uproot": read_ccdb_canvas_uproot,
+    "root": read_ccdb_canvas_root,
+}
+
+BYTES_BACKENDS: Dict[str, Callable[[bytes, str], List[CanvasPrimitive]]] = {
+    "uproot": read_ccdb_canvas_uproot_from_bytes,
+    "root": read_ccdb_canvas_root_from_bytes,
+}
+
+
+def read_ccdb_canvas(fpath: str, backend: str = "auto") -> List[CanvasPrimitive]:
+    """
+    Read the `ccdb_object` canvas of one QCDB ROOT file.
+    Raises RuntimeError when the file or the canvas cannot be read.
+    """
+    if backend != "auto":
+        return BACKENDS[backend](fpath)
+
+    if uproot is not None:
+        try:
+            return read_ccdb_canvas_uproot(fpath)
+        except Exception as e:
+            logger.debug(f"uproot could not read {fpath} ({e}), falling back to ROOT")
+    return read_ccdb_canvas_root(fpath)
+
+
+def read_ccdb_canvas_from_bytes(data: bytes, name: str = "in-memory.root", backend: str = "auto") -> List[CanvasPrimitive]:
+    """
+    Same as read_ccdb_canvas for a ROOT file held in memory (ex. a QCDB download
+    response body), without writing it to disk first.
+    """
+    if backend != "auto":
+        return BYTES_BACKENDS[backend](data, name)
+
+    if uproot is not None:
+        try:
+            return read_ccdb_canvas_uproot_from_bytes(data, name)
+        except Exception as e:
+            logger.debug(f"uproot could not read {name} ({e}), falling back to ROOT")
+    return read_ccdb_canvas_root_from_bytes(data, name)
+
@@ -0,0 +1,50 @@
+"""
+Streaming conversion for near-real-time scoring: the bytes of a QCDB download
+response are opened as an in-memory ROOT file, the TH2 tensors are extracted and
+appended to a tensor store, without a disk write/read of the raw object in between.
+The raw object can still be archived, off the critical path of the conversion.
+"""
+import os
+from typing import Optional
+
+import requests
+
+from root_readers import read_ccdb_canvas_from_bytes, th2_tensors_from_primitives
+from tensor_store import TensorStoreWriter
+
+
+def archive_raw_bytes(data: bytes, outdir: str, file_name: str) -> str:
+    os.makedirs(outdir, exist_ok=True)
+    dst = os.path.join(outdir, file_name)
+    tmp = f"{dst}.part"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, dst)
+    return dst
+
+
+def convert_response_to_tensor_store(
+    resp: requests.Response,
+    writer: TensorStoreWriter,
+    file_name: str,
+    run_number: Optional[int] = None,
+    raw_dir: Optional[str] = None,
+    backend: str = "auto",
+) -> Optional[int]:
+    """
+    Convert one downloaded ccdb_object straight from memory into `writer`.
+    Returns the index of the stored array, None when the object holds no TH2.
+    With `raw_dir`, the raw bytes are first archived there under `file_name`, so an
+    object the reader cannot parse (not a TCanvas, corrupt payload) is still kept.
+    """
+    data = resp.content
+
+    if raw_dir is not None:
+        archive_raw_bytes(data, raw_dir, file_name)
+
+    primitives = read_ccdb_canvas_from_bytes(data, name=file_name, backend=backend)
+    tensors = th2_tensors_from_primitives(primitives)
+
+    if tensors is None:
+        return None
+    return writer.add(tensors, source_file=file_name, run_number=run_number)
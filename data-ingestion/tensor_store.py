@@ -0,0 +1,127 @@
+import os
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+INDEX_FILENAME = "index.json"
+
+
+def shard_filename(shard_id: int) -> str:
+    return f"shard-{shard_id:05d}.bin"
+
+
+class TensorStoreWriter:
+    """
+    Pack converted histograms into a few large raw shard files instead of one
+    .npz per ROOT object.
+
+    Layout of `store_dir`:
+        shard-00000.bin, shard-00001.bin, ...   raw C-ordered arrays of `dtype`, back to back
+        index.json                              dtype + one entry per array:
+                                                {shard, offset (bytes), shape, run_number, source_file}
+
+    Appending to an existing store starts a new shard, existing shards are never rewritten.
+    """
+
+    def __init__(self, store_dir: str, dtype=np.float32, shard_size_bytes: int = 1 << 30):
+        self.store_dir = store_dir
+        self.dtype = np.dtype(dtype)
+        self.shard_size_bytes = shard_size_bytes
+        os.makedirs(store_dir, exist_ok=True)
+
+        self.entries: List[Dict[str, Any]] = []
+        self.n_shards = 0
+
+        index_path = os.path.join(store_dir, INDEX_FILENAME)
+        if os.path.isfile(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if np.dtype(index["dtype"]) != self.dtype:
+                raise ValueError(f"Store {store_dir} holds {index['dtype']}, cannot append {self.dtype}")
+            self.entries = index["entries"]
+            self.n_shards = index["n_shards"]
+
+        self._shard = None
+        self._shard_id = None
+        self._shard_bytes = 0
+
+    def _open_new_shard(self):
+        if self._shard is not None:
+            self._shard.close()
+        self._shard_id = self.n_shards
+        self.n_shards += 1
+        self._shard = open(os.path.join(self.store_dir, shard_filename(self._shard_id)), "wb")
+        self._shard_bytes = 0
+
+    def add(self, array: np.ndarray, source_file: str, run_number: Optional[int] = None) -> int:
+        """Append one array, return its index in the store."""
+        arr = np.ascontiguousarray(array, dtype=self.dtype)
+
+        if self._shard is None or (self._shard_bytes and self._shard_bytes + arr.nbytes > self.shard_size_bytes):
+            self._open_new_shard()
+
+        self.entries.append({
+            "shard": self._shard_id,
+            "offset": self._shard_bytes,
+            "shape": list(arr.shape),
+            "run_number": None if run_number is None else int(run_number),
+            "source_file": source_file,
+        })
+        self._shard.write(arr.tobytes())
+        self._shard_bytes += arr.nbytes
+        return len(self.entries) - 1
+
+    def close(self):
+        if self._shard is not None:
+            self._shard.close()
+            self._shard = None
+
+        index_path = os.path.join(self.store_dir, INDEX_FILENAME)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dtype": self.dtype.str, "n_shards": self.n_shards, "entries": self.entries}, f)
+        os.replace(tmp_path, index_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TensorStoreReader:
+    """
+    Read a store written by TensorStoreWriter. Items are np.memmap views into the
+    shards (no decompression, no copy); shards are mapped lazily, once per process.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, INDEX_FILENAME), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.dtype = np.dtype(index["dtype"])
+        self.entries: List[Dict[str, Any]] = index["entries"]
+        self._shards: Dict[int, np.memmap] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _shard(self, shard_id: int) -> np.memmap:
+        if shard_id not in self._shards:
+            path = os.path.join(self.store_dir, shard_filename(shard_id))
+            self._shards[shard_id] = np.memmap(path, dtype=self.dtype, mode="r")
+        return self._shards[shard_id]
+
+    def __getitem__(self, idx: int) -> np.memmap:
+        entry = self.entries[idx]
+        start = entry["offset"] // self.dtype.itemsize
+        count = int(np.prod(entry["shape"]))
+        return self._shard(entry["shard"])[start:start + count].reshape(entry["shape"])
+
+    def __getstate__(self):
+        # memmaps are re-opened in each DataLoader worker
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        return state
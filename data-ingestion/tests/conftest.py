@@ -0,0 +1,38 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# the data-ingestion modules are imported as plain modules (they are run from that folder)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TH2_NX, TH2_NY = 7, 5
+
+
+@pytest.fixture
+def th2_shape():
+    """(rows, cols) of the arrays read from the histograms of `filled_th2`."""
+    return TH2_NY, TH2_NX
+
+
+@pytest.fixture
+def filled_th2():
+    """
+    Factory of TH2_NX x TH2_NY ROOT histograms of a given class (TH2F, ..., TProfile2D),
+    filled with seeded random weights, under/overflow included. Skips without ROOT.
+    """
+    ROOT = pytest.importorskip("ROOT")
+    ROOT.gROOT.SetBatch(True)
+
+    def make(cls_name, seed=0):
+        h = getattr(ROOT, cls_name)(f"h_{cls_name}", cls_name, TH2_NX, 0.0, 1.0, TH2_NY, 0.0, 1.0)
+        rng = np.random.default_rng(seed)
+        for x, y, w in zip(rng.uniform(-0.1, 1.1, 500), rng.uniform(-0.1, 1.1, 500), rng.uniform(1.0, 3.0, 500)):
+            if cls_name == "TProfile2D":
+                h.Fill(x, y, w * 10.0, w)
+            else:
+                h.Fill(x, y, w)
+        return h
+
+    return make
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+ROOT = pytest.importorskip("ROOT")
+pytest.importorskip("uproot")
+
+from root_readers import read_ccdb_canvas, read_ccdb_canvas_from_bytes
+
+
+@pytest.fixture
+def ccdb_object_file(tmp_path, filled_th2):
+    """A QCDB-like file: a `ccdb_object` canvas with TH2 pads and a quality summary TPaveText."""
+    keep = []
+
+    canvas = ROOT.TCanvas("ccdb_object", "", 400, 400)
+    canvas.Divide(2, 2)
+    for i, cls_name in enumerate(["TH2F", "TH2D", "TProfile2D"], start=1):
+        canvas.cd(i)
+        h = filled_th2(cls_name, seed=i)
+        h.Draw("COLZ")
+        keep.append(h)
+
+    canvas.cd(4)
+    poly = ROOT.TH2Poly("h_poly", "", 0.0, 1.0, 0.0, 1.0)
+    poly.AddBin(0.0, 0.0, 0.5, 0.5)
+    poly.Fill(0.25, 0.25, 2.0)
+    poly.Draw()
+    pave = ROOT.TPaveText(0.1, 0.1, 0.9, 0.9)
+    pave.AddText("Quality: Good")
+    pave.AddText("Flag: Unknown")
+    pave.Draw()
+    keep += [poly, pave]
+
+    path = str(tmp_path / "ccdb_object.root")
+    f = ROOT.TFile.Open(path, "RECREATE")
+    canvas.Write("ccdb_object")
+    f.Close()
+    return path
+
+
+def assert_same_primitives(a, b, shape):
+    assert [p.class_name for p in a] == [p.class_name for p in b]
+    for pa, pb in zip(a, b):
+        assert pa.lines == pb.lines
+        assert len(pa.histograms) == len(pb.histograms)
+        for ha, hb in zip(pa.histograms, pb.histograms):
+            assert ha.shape == hb.shape == shape
+            assert ha.dtype == hb.dtype == np.float32
+            np.testing.assert_allclose(ha, hb, rtol=1e-6)
+
+
+def test_backends_agree(ccdb_object_file, th2_shape):
+    a = read_ccdb_canvas(ccdb_object_file, backend="uproot")
+    b = read_ccdb_canvas(ccdb_object_file, backend="root")
+    assert_same_primitives(a, b, th2_shape)
+
+    # TH2F, TH2D and TProfile2D pads hold one histogram each, the TH2Poly is skipped by both
+    assert [len(p.histograms) for p in a] == [1, 1, 1, 0]
+    assert a[3].lines == ["Quality: Good", "Flag: Unknown"]
+
+
+def test_backends_agree_from_bytes(ccdb_object_file, th2_shape):
+    with open(ccdb_object_file, "rb") as f:
+        data = f.read()
+    a = read_ccdb_canvas_from_bytes(data, backend="uproot")
+    b = read_ccdb_canvas_from_bytes(data, backend="root")
+    assert_same_primitives(a, b, th2_shape)
+    assert_same_primitives(a, read_ccdb_canvas(ccdb_object_file, backend="uproot"), th2_shape)
@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ROOT")
+
+from root_readers import th2_to_numpy, th2_to_numpy_per_bin
+
+
+@pytest.mark.parametrize("cls_name", ["TH2F", "TH2D", "TH2I", "TH2S", "TH2C", "TProfile2D"])
+def test_th2_to_numpy_matches_per_bin(cls_name, filled_th2, th2_shape):
+    h = filled_th2(cls_name)
+    fast = th2_to_numpy(h)
+    ref = th2_to_numpy_per_bin(h)
+    assert fast.shape == th2_shape
+    assert fast.dtype == np.float32
+    np.testing.assert_array_equal(fast, ref)
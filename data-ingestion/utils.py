@@ -6,11 +6,6 @@ import os
 import math, os, sys, re
 import time
 from tqdm import tqdm
-try:
-    import ROOT 
-except Exception as e:
-    raise SystemExit("PyROOT import failed. Make sure your kernel uses the env with ROOT installed.\n" + str(e))
-
 
 import pandas as pd
 import plotly.graph_objects as go
@@ -20,14 +15,39 @@ import numpy as np
 from tqdm.auto import tqdm 
 import shutil 
 import logging
+from typing import Any, Dict, List, Optional
+
+from metadata_journal import JOURNAL_SUFFIXES, iter_records
+from conversion_manifest import ConversionManifest
+from quality_summary_index import QualitySummaryIndex
+from root_readers import get_root, read_ccdb_canvas, th2_tensors_from_primitives, th2_to_numpy
+from tensor_store import TensorStoreWriter
 
 logger = logging.getLogger(__name__)
 
-def load_json_file_into_df(filepath): 
-    with open(filepath, "r") as f: 
-        data = json.load(f)
-    # Note: pd.DataFrame loads the list of dicts directly into columns, while pd.json_normalize also flattens nested JSON fields into separate columns.
-    return pd.json_normalize(data) 
+def load_json_file_into_df(filepath, chunk_size=10000): 
+    if not str(filepath).endswith(JOURNAL_SUFFIXES):
+        with open(filepath, "r") as f: 
+            data = json.load(f)
+        # Note: pd.DataFrame loads the list of dicts directly into columns, while pd.json_normalize also flattens nested JSON fields into separate columns.
+        return pd.json_normalize(data) 
+
+    # JSON Lines journal (.jsonl / .jsonl.gz): streamed and normalized chunk by chunk
+    chunks, records = [], []
+    for rec in iter_records(filepath):
+        records.append(rec)
+        if len(records) == chunk_size:
+            chunks.append(pd.json_normalize(records))
+            records = []
+    if records or not chunks:
+        chunks.append(pd.json_normalize(records))
+    df = pd.concat(chunks, ignore_index=True)
+
+    # re-downloads append the same versions again: keep the last record per ETag, as metadata_journal.compact
+    if "ETag" in df.columns:
+        etags = df["ETag"].astype(str).str.strip('"').where(df["ETag"].notna())
+        df = df[etags.isna() | ~etags.duplicated(keep="last")].reset_index(drop=True)
+    return df
 
 
 def config_logger(output_file="output.log"): 
@@ -59,48 +79,16 @@ def config_logger(output_file="output.log"):
     return logger
 
 
-def load_quality_summ_from_root_objects(filepath_of_root_objects):
-    
-    list_root_obj_names_wprefix = os.listdir(filepath_of_root_objects)
-    logger.info(f'Root objects to process and extract the quality summary from: {len(list_root_obj_names_wprefix)}')
-
-    quality_dict = {}
-
-    for root_obj in list_root_obj_names_wprefix: 
-        ROOT_FILE = os.path.join(filepath_of_root_objects,root_obj)
-        root_object_name_wtprefix = os.path.basename(ROOT_FILE)
-
-        f = ROOT.TFile.Open(ROOT_FILE, "READ")
-        if not f or f.IsZombie():
-            raise SystemExit(f"Failed to open {ROOT_FILE}")
-
-        canvas = f.Get("ccdb_object") 
-        if not canvas:
-            raise SystemExit("Canvas not found.")
-
-        tcanvas_prim_list = canvas.GetListOfPrimitives()
-        try: 
-            obj = tcanvas_prim_list[0] # it will always have one object in the quality summaries case 
-
-            lines = obj.GetListOfLines()  # this is a TList of TLatex
-            for line in lines:
-                # for TLatex, text is in the "title"
-                text = line.GetTitle()
-                match_obj = re.search(r"\{([^}]*)\}", text)
-                if not match_obj:
-                    continue
-                match_text = match_obj.group(1)
-                    
-                # split in key-value pairs to save in a json file 
-                if ":" in match_text:
-                    key, value = [s.strip() for s in match_text.split(":",1)]
-
-                    quality_dict.setdefault(root_object_name_wtprefix, {})
-                    quality_dict[root_object_name_wtprefix][key] = value
-        except Exception as e: 
-            #logger.error(f"Extracting quality summary from root object: {root_obj}, with error: {e}")
-            continue
-    return quality_dict
+def load_quality_summ_from_root_objects(filepath_of_root_objects, backend="auto", n_workers=1, index_path=None):
+    """
+    {file_name: {quality: value}} for all QualitySummary ROOT objects of the folder.
+    Backed by a QualitySummaryIndex (default: beside the folder), so only new or
+    changed files are parsed.
+    """
+    index_path = index_path or QualitySummaryIndex.default_path(filepath_of_root_objects)
+    with QualitySummaryIndex(index_path) as index:
+        index.refresh(filepath_of_root_objects, n_workers=n_workers, backend=backend)
+        return index.as_dict()
     
 
 def build_bkkp_run_api_url(
@@ -157,11 +145,12 @@ def has_beam_type(run: dict, beam_type: str) -> bool:   # 'PP' or 'PbPb'
 
 # Convert ROOT to IMAGES 
 
-def make_canvas_exact(name: str, w: int, h: int) -> ROOT.TCanvas:
+def make_canvas_exact(name: str, w: int, h: int) -> "ROOT.TCanvas":
     """
     ROOT's TCanvas(w,h) is not always the final pixel buffer size.
     This forces the internal canvas size to w×h.
     """
+    ROOT = get_root()
     c = ROOT.TCanvas(name, "", w, h)
     c.SetFillColor(0)
     c.SetBorderMode(0)
@@ -212,20 +201,21 @@ def strip_axes_and_ticks(h):
         ax.SetTitleColor(0)
 
 
-def pad_no_ticks(p: ROOT.TPad):
+def pad_no_ticks(p: "ROOT.TPad"):
     # Pad-level ticks off (ROOT can draw ticks from pad settings)
     p.SetTicks(0, 0)
     p.SetGrid(0, 0)
 
+    ROOT = get_root()
     ROOT.gStyle.SetPadTickX(0)
     ROOT.gStyle.SetPadTickY(0)
 
 
-def export_pad_png_1to1(p: ROOT.TPad, out_png: str, grey_scale: bool):
+def export_pad_png_1to1(p: "ROOT.TPad", out_png: str, grey_scale: bool):
     p.Update()
     p.GetCanvas().Update()
 
-    img = ROOT.TImage.Create()
+    img = get_root().TImage.Create()
     img.FromPad(p) #    Export exactly the rendered pad pixels (avoid SaveAs driver scaling).
     if grey_scale: 
         img.Gray()
@@ -234,94 +224,205 @@ def export_pad_png_1to1(p: ROOT.TPad, out_png: str, grey_scale: bool):
     img.WriteImage(out_png)
 
 
-def convert_root_files_to_img(ROOT_FILES_PATH, img_folder_of_root_obj, grey_scale=True, W=330, H=330):
+# (canvas, pad) pair of the current process, sized once and reused for every pad it renders
+_IMG_CANVAS = None
 
-    ROOT.gROOT.SetBatch(True)
-    ROOT.gErrorIgnoreLevel = ROOT.kWarning
 
-    os.makedirs(img_folder_of_root_obj, exist_ok=True)
-    root_filenames = [fn for fn in os.listdir(ROOT_FILES_PATH) if fn.endswith(".root")]
+def init_img_worker(W: int, H: int):
+    """
+    Process-pool initializer for image conversion: ROOT in batch mode and one
+    pre-sized W×H canvas with a margin-less full-size pad, reused for all files.
+    """
+    global _IMG_CANVAS
+    ROOT = get_root() # batch mode, warnings and above only
+    ROOT.gStyle.SetOptTitle(0)
+    ROOT.gStyle.SetOptStat(0)
 
-    for root_filename in tqdm(root_filenames, total=len(root_filenames),
-                              desc="Convert root objects to images."):
+    c = make_canvas_exact(f"c_img_{os.getpid()}", W, H)
 
-        try:
-            fpath = os.path.join(ROOT_FILES_PATH, root_filename)
-            f = ROOT.TFile.Open(fpath, "READ")
+    # Fill the whole canvas with a pad (no margins/borders)
+    p = ROOT.TPad("p_tmp", "", 0, 0, 1, 1)
+    p.SetFillColor(0)
+    p.SetBorderMode(0)
+    p.SetBorderSize(0)
+    p.SetLeftMargin(0.0)
+    p.SetRightMargin(0.0)
+    p.SetTopMargin(0.0)
+    p.SetBottomMargin(0.0)
+    pad_no_ticks(p)
 
-            canvas = f.Get("ccdb_object")
-            if not canvas:
-                raise RuntimeError("ccdb_object not found in file.")
+    c.cd()
+    p.Draw()
 
-            tcanvas_prim_list = canvas.GetListOfPrimitives()
+    _IMG_CANVAS = (c, p, W, H)
 
-            for i, src_pad in enumerate(tcanvas_prim_list):
-                if i < 2: # Because we know that the 3rd and 4rth pad are the histograms
 
-                    c = make_canvas_exact(f"c_{root_filename[:-5]}_{i}", W, H)
+def draw_src_pad_on(p: "ROOT.TPad", src_pad: "ROOT.TPad") -> list:
+    """
+    Draw the main object (TH*/TGraph*/TProfile*) of `src_pad` without axes, plus its
+    overlays, on `p`. Returns the drawn clones: keep them alive until `p` is exported.
+    """
+    p.cd()
 
-                    # Fill the whole canvas with a pad (no margins/borders)
-                    p = ROOT.TPad("p_tmp", "", 0, 0, 1, 1)
-                    p.SetFillColor(0)
-                    p.SetBorderMode(0)
-                    p.SetBorderSize(0)
-                    p.SetLeftMargin(0.0)
-                    p.SetRightMargin(0.0)
-                    p.SetTopMargin(0.0)
-                    p.SetBottomMargin(0.0)
-                    pad_no_ticks(p)
+    prims = src_pad.GetListOfPrimitives()
 
-                    p.Draw()
-                    p.cd()
+    main_obj = None
+    overlay_objs = []
 
-                    ROOT.gStyle.SetOptTitle(0)
-                    ROOT.gStyle.SetOptStat(0)
+    for prim in prims:
+        cname_prim = prim.ClassName()
 
-                    prims = src_pad.GetListOfPrimitives()
+        if (main_obj is None and
+            (cname_prim.startswith("TH") or
+            cname_prim.startswith("TGraph") or
+            cname_prim.startswith("TProfile"))):
+            main_obj = prim
 
-                    main_obj = None
-                    overlay_objs = []
+        elif cname_prim in [
+            "TLine", "TPolyLine", "TPolyMarker", "TBox",
+            "TEllipse", "TArc", "TCutG"
+        ]:
+            overlay_objs.append(prim)
 
-                    for prim in prims:
-                        cname_prim = prim.ClassName()
+    drawn = []
+    if main_obj:
+        main_clone = main_obj.Clone()
+        if main_clone.InheritsFrom("TH1") or main_clone.InheritsFrom("TProfile"):
+            strip_axes_and_ticks(main_clone)
 
-                        if (main_obj is None and
-                            (cname_prim.startswith("TH") or
-                            cname_prim.startswith("TGraph") or
-                            cname_prim.startswith("TProfile"))):
-                            main_obj = prim
+        draw_opt = main_obj.GetDrawOption() or "COL"
+        main_clone.Draw(draw_opt)
+        drawn.append(main_clone)
 
-                        elif cname_prim in [
-                            "TLine", "TPolyLine", "TPolyMarker", "TBox",
-                            "TEllipse", "TArc", "TCutG"
-                        ]:
-                            overlay_objs.append(prim)
+        for obj in overlay_objs:
+            obj_clone = obj.Clone()
+            obj_clone.Draw(obj.GetDrawOption())
+            drawn.append(obj_clone)
+    else:
+        # fallback: draw whole pad content
+        src_pad.Draw()
 
-                    if main_obj:
-                        main_clone = main_obj.Clone()
-                        if main_clone.InheritsFrom("TH1") or main_clone.InheritsFrom("TProfile"):
-                            strip_axes_and_ticks(main_clone)
+    return drawn
 
-                        draw_opt = main_obj.GetDrawOption() or "COL"
-                        main_clone.Draw(draw_opt)
 
-                        for obj in overlay_objs:
-                            obj_clone = obj.Clone()
-                            obj_clone.Draw(obj.GetDrawOption())
-                    else:
-                        # fallback: draw whole pad content
-                        src_pad.Draw()
+def convert_root_file_to_img(ROOT_FILES_PATH: str, root_filename: str, img_folder_of_root_obj: str,
+                             grey_scale: bool = True, W: int = 330, H: int = 330) -> Dict[str, Any]:
+    """
+    Render the first two pads of one ccdb_object canvas to `<name>_<pad>.png` on the
+    process' reused canvas. Never raises: the outcome and timing are returned as a manifest entry.
+    """
+    if _IMG_CANVAS is None or _IMG_CANVAS[2:] != (W, H):
+        init_img_worker(W, H)
+    _, p, _, _ = _IMG_CANVAS
 
+    entry = {"file": root_filename, "outputs": [], "seconds": 0.0, "error": None}
+    t0 = time.perf_counter()
+    f = None
+    try:
+        fpath = os.path.join(ROOT_FILES_PATH, root_filename)
+        f = get_root().TFile.Open(fpath, "READ")
+        if not f or f.IsZombie():
+            raise RuntimeError(f"Failed to open {fpath}")
+
+        canvas = f.Get("ccdb_object")
+        if not canvas:
+            raise RuntimeError("ccdb_object not found in file.")
+
+        tcanvas_prim_list = canvas.GetListOfPrimitives()
+
+        for i, src_pad in enumerate(tcanvas_prim_list):
+            if i < 2: # Because we know that the 3rd and 4rth pad are the histograms
+                drawn = draw_src_pad_on(p, src_pad)
+                try:
                     out_name = os.path.join(img_folder_of_root_obj, f"{root_filename[:-5]}_{i}.png")
                     export_pad_png_1to1(p, out_name, grey_scale)
+                    entry["outputs"].append(out_name)
+                finally:
+                    p.Clear() # detach the clones before they are garbage collected
+                    del drawn
 
-                    c.Close()
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
 
-                f.Close()
+    finally:
+        if f:
+            f.Close()
+        entry["seconds"] = time.perf_counter() - t0
 
-        except Exception as e:
-            print(f"Error on file {root_filename}: {e}")
-            continue
+    return entry
+
+
+def convert_root_files_to_img(ROOT_FILES_PATH, img_folder_of_root_obj, grey_scale=True, W=330, H=330,
+                              incremental=True, n_workers=1, manifest_name="conversion_manifest.json"):
+    """
+    Render the first two pads of every ccdb_object canvas to `<name>_<pad>.png`.
+
+    n_workers > 1 shards the files over a process pool; every worker keeps one
+    pre-sized canvas/pad pair for all its files. Per-file timings and failures are
+    reported at the end and written to `<img_folder_of_root_obj>/<manifest_name>`.
+
+    With incremental=True, files already converted with the same parameters
+    (see ConversionManifest, stored beside `img_folder_of_root_obj`) are skipped.
+    """
+    get_root() # fail early: image conversion renders through ROOT and needs it installed
+
+    os.makedirs(img_folder_of_root_obj, exist_ok=True)
+    root_filenames = sorted(fn for fn in os.listdir(ROOT_FILES_PATH) if fn.endswith(".root"))
+
+    params = {"kind": "image", "pads": [0, 1], "grey_scale": grey_scale, "W": W, "H": H}
+    conversion_manifest = ConversionManifest.for_dest_folder(img_folder_of_root_obj)
+    if incremental:
+        n_total = len(root_filenames)
+        root_filenames = conversion_manifest.pending(ROOT_FILES_PATH, root_filenames, params)
+        logger.info(f"{n_total - len(root_filenames)}/{n_total} root objects are up to date, converting {len(root_filenames)}.")
+
+    t0 = time.perf_counter()
+    entries = []
+
+    def collect(e):
+        # recorded as results come in, an interrupted backfill resumes where it stopped
+        entries.append(e)
+        if e["error"] is None:
+            conversion_manifest.record(os.path.join(ROOT_FILES_PATH, e["file"]), params, e["outputs"])
+        conversion_manifest.save_if_due()
+
+    try:
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=init_img_worker, initargs=(W, H)) as pool:
+                futures = [
+                    pool.submit(convert_root_file_to_img, ROOT_FILES_PATH, root_filename, img_folder_of_root_obj, grey_scale, W, H)
+                    for root_filename in root_filenames
+                ]
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Convert root objects to images."):
+                    collect(future.result())
+        else:
+            for root_filename in tqdm(root_filenames, total=len(root_filenames),
+                                      desc="Convert root objects to images."):
+                collect(convert_root_file_to_img(ROOT_FILES_PATH, root_filename, img_folder_of_root_obj, grey_scale, W, H))
+    finally:
+        conversion_manifest.save()
+    wall_seconds = time.perf_counter() - t0
+
+    entries.sort(key=lambda e: e["file"])
+
+    manifest = {
+        "succeeded": [e for e in entries if e["error"] is None],
+        "failed": [e for e in entries if e["error"] is not None],
+    }
+    with open(os.path.join(img_folder_of_root_obj, manifest_name), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    seconds = [e["seconds"] for e in entries]
+    if seconds:
+        logger.info(
+            f"Converted {len(manifest['succeeded'])}/{len(entries)} root objects to images in {wall_seconds:.1f}s "
+            f"with {n_workers} worker(s): per file mean {np.mean(seconds):.3f}s, max {max(seconds):.3f}s "
+            f"({max(entries, key=lambda e: e['seconds'])['file']})."
+        )
+    for e in manifest["failed"]:
+        logger.error(f"Error on file {e['file']}: {e['error']}")
+
+    return manifest
         
         
 
@@ -329,78 +430,214 @@ def convert_root_files_to_img(ROOT_FILES_PATH, img_folder_of_root_obj, grey_scal
 # Convert ROOT to TENSORS 
 
 import os 
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 from tqdm import tqdm
-import ROOT 
 import numpy as np
-from typing import Any, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 
-def th2_to_numpy(th2:Any) -> np.ndarray:
-    
-    nx = th2.GetNbinsX()
-    ny = th2.GetNbinsY()
-    a = np.zeros((ny, nx), dtype=np.float32)  # rows=y, cols=x
-    for ix in range(1, nx+1):
-        for iy in range(1, ny+1):
-            a[iy-1, ix-1] = th2.GetBinContent(ix, iy)
-    return a
+def init_root_worker(backend: str = "auto"):
+    """
+    Process-pool initializer: import and configure ROOT once per worker process
+    (batch mode, no graphics, warnings and above only) when the "root" backend is used.
+    Otherwise ROOT is only imported if uproot fails on a file, see root_readers.get_root.
+    """
+    if backend == "root":
+        get_root()
+
+
+def save_npz_deterministic(path: str, **arrays: np.ndarray):
+    """
+    Same layout as np.savez_compressed (one deflated `<key>.npy` entry per array)
+    but with a fixed zip timestamp, so converting the same ROOT file twice
+    (serially or in a worker process) produces byte-identical .npz files.
+    """
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for key, arr in arrays.items():
+            info = zipfile.ZipInfo(f"{key}.npy", date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zf.open(info, "w", force_zip64=True) as fh:
+                np.lib.format.write_array(fh, np.asanyarray(arr), allow_pickle=False)
+
+
+def extract_th2_tensors_from_root_file(fpath: str, backend: str = "auto") -> Optional[np.ndarray]:
+    """
+    Read one ccdb_object ROOT file and stack the TH2 histograms of its first
+    two pads into a (N, H, W) array. Returns None when there is no TH2.
+    Raises RuntimeError when the file or the canvas cannot be read.
+    """
+    return th2_tensors_from_primitives(read_ccdb_canvas(fpath, backend=backend))
+
+
+def convert_root_file_to_tensor(ROOT_FILES_PATH: str, root_filename: str, dest_folder: str, backend: str = "auto") -> Dict[str, Any]:
+    """
+    Convert a single ROOT file into `<dest_folder>/<name>.npz`.
+    Never raises: the outcome is returned as a manifest entry.
+    """
+    entry = {"file": root_filename, "output": None, "n_histograms": 0, "error": None}
+    try:
+        data = extract_th2_tensors_from_root_file(os.path.join(ROOT_FILES_PATH, root_filename), backend=backend)
+        if data is not None:
+            out_path = os.path.join(dest_folder, root_filename.replace(".root", ".npz"))
+            save_npz_deterministic(out_path, data=data)
+            entry["output"] = out_path
+            entry["n_histograms"] = int(data.shape[0])
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    return entry
+
 
 def convert_root_files_to_tensors(
         ROOT_FILES_PATH: str,
-        dest_folder: str
-    ) -> List[Tuple[str, str, np.ndarray]]:
-    
+        dest_folder: str,
+        n_workers: int = 1,
+        manifest_name: str = "conversion_manifest.json",
+        incremental: bool = True,
+        backend: str = "auto",
+    ) -> Dict[str, List[Dict[str, Any]]]:
+
     """
-    Extract TH2 histograms from ROOT files and convert them to NumPy arrays.
+    Extract TH2 histograms from ROOT files and save them as (N, H, W) arrays
+    in one .npz per ROOT file.
+
+    n_workers > 1 spreads the files over a process pool (ROOT is initialised
+    once per worker). A file that fails does not stop the batch: every outcome
+    is collected in a manifest written to `<dest_folder>/<manifest_name>`.
+
+    With incremental=True, files already converted with the same parameters
+    (see ConversionManifest, stored beside `dest_folder`) are skipped, so a rerun
+    only costs time for new or modified files.
+
+    `backend` selects the reader ("auto", "uproot" or "root", see root_readers).
 
     Returns
     -------
-    List of tuples:
-        ("TH2", histogram_name, numpy_array)
+    The manifest: {"succeeded": [...], "failed": [...]}
     """
-        
-    root_filenames = [
+
+    root_filenames = sorted(
         f for f in os.listdir(ROOT_FILES_PATH)
         if f.endswith(".root")
         and os.path.isfile(os.path.join(ROOT_FILES_PATH, f))
-    ]    
-    
+    )
+
     os.makedirs(dest_folder, exist_ok=True)
 
-    for root_filename in tqdm(iterable=root_filenames, total=len(root_filenames)): 
-        f = ROOT.TFile.Open(os.path.join(ROOT_FILES_PATH,root_filename), "READ")
-        if not f or f.IsZombie(): # IsZombie checks if ROOT failed internally
-            raise SystemExit(f"Failed to open {os.path.join(ROOT_FILES_PATH,root_filename)}")
-        
-        canvas = f.Get("ccdb_object") 
-        if not canvas:
-            raise SystemExit("Histogram not found. Pick a name printed in the previous cell.")
-        
-        tcanvas_prim_list = canvas.GetListOfPrimitives() #  { @0x16dcf0f78, @0x16dcf0f78, @0x16dcf0f78, @0x16dcf0f78 }
-        
-        tensors = []        
+    params = {"kind": "tensor", "pads": [0, 1], "dtype": "float32"}
+    conversion_manifest = ConversionManifest.for_dest_folder(dest_folder)
+    if incremental:
+        n_total = len(root_filenames)
+        root_filenames = conversion_manifest.pending(ROOT_FILES_PATH, root_filenames, params)
+        logger.info(f"{n_total - len(root_filenames)}/{n_total} root objects are up to date, converting {len(root_filenames)}.")
 
-        for i , pad in enumerate(tcanvas_prim_list):
-            if i<2: 
-                prims = pad.GetListOfPrimitives()
+    entries = []
 
-                for obj in prims: # obj has TFrame, TH2, TLine and anything relevant to draw the pad which the histogram we are seeing
-                
-                    cls = obj.ClassName()
+    def collect(e):
+        # recorded as results come in, an interrupted backfill resumes where it stopped
+        entries.append(e)
+        if e["error"] is None:
+            outputs = [e["output"]] if e["output"] else []
+            conversion_manifest.record(os.path.join(ROOT_FILES_PATH, e["file"]), params, outputs)
+        conversion_manifest.save_if_due()
+
+    try:
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=init_root_worker, initargs=(backend,)) as pool:
+                futures = [
+                    pool.submit(convert_root_file_to_tensor, ROOT_FILES_PATH, root_filename, dest_folder, backend)
+                    for root_filename in root_filenames
+                ]
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Convert root objects to tensors."):
+                    collect(future.result())
+        else:
+            for root_filename in tqdm(iterable=root_filenames, total=len(root_filenames), desc="Convert root objects to tensors."):
+                collect(convert_root_file_to_tensor(ROOT_FILES_PATH, root_filename, dest_folder, backend))
+    finally:
+        conversion_manifest.save()
+
+    entries.sort(key=lambda e: e["file"])
+
+    manifest = {
+        "succeeded": [e for e in entries if e["error"] is None],
+        "failed": [e for e in entries if e["error"] is not None],
+    }
+    with open(os.path.join(dest_folder, manifest_name), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    logger.info(f"Converted {len(manifest['succeeded'])}/{len(entries)} root objects to tensors, {len(manifest['failed'])} failed.")
+    for e in manifest["failed"]:
+        logger.error(f"Error on file {e['file']}: {e['error']}")
+
+    return manifest
+
+
+def load_run_numbers_from_metadata(filepath) -> Dict[str, int]:
+    """Map fileName -> RunNumber from a QCDB metadata JSON (as written by browse)."""
+    metadata = load_json_file_into_df(filepath)
+    return dict(zip(metadata["fileName"], metadata["RunNumber"].astype("int64")))
+
+
+def _extract_th2_tensors_for_store(fpath: str, backend: str = "auto"):
+    # module-level so it can be sent to the worker processes
+    try:
+        return extract_th2_tensors_from_root_file(fpath, backend=backend), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
 
-                    if obj.InheritsFrom("TH2"):
-                        tensor = th2_to_numpy(obj)
-                        tensors.append(tensor)
 
-        if tensors:
-            data = np.stack(tensors)  # (N, H, W)
+def convert_root_files_to_tensor_store(
+        ROOT_FILES_PATH: str,
+        store_dir: str,
+        run_numbers: Optional[Dict[str, int]] = None,
+        n_workers: int = 1,
+        shard_size_bytes: int = 1 << 30,
+        backend: str = "auto",
+    ) -> Dict[str, List[str]]:
+    """
+    Same extraction as convert_root_files_to_tensors, but the (N, H, W) arrays are
+    appended to a sharded TensorStoreWriter store instead of one .npz per file.
+    `run_numbers` (fileName -> RunNumber, see load_run_numbers_from_metadata) is
+    saved in the store index next to each array.
+
+    Returns {"succeeded": [file names], "failed": [file names]}.
+    """
+    root_filenames = sorted(
+        f for f in os.listdir(ROOT_FILES_PATH)
+        if f.endswith(".root")
+        and os.path.isfile(os.path.join(ROOT_FILES_PATH, f))
+    )
+    fpaths = [os.path.join(ROOT_FILES_PATH, f) for f in root_filenames]
+    run_numbers = run_numbers or {}
+
+    succeeded, failed = [], []
+    pool = ProcessPoolExecutor(max_workers=n_workers, initializer=init_root_worker, initargs=(backend,)) if n_workers > 1 else None
+    try:
+        # pool.map keeps the file order, so shards are written sequentially in name order
+        extract = partial(_extract_th2_tensors_for_store, backend=backend)
+        results = pool.map(extract, fpaths, chunksize=16) if pool else map(extract, fpaths)
+
+        with TensorStoreWriter(store_dir, shard_size_bytes=shard_size_bytes) as writer:
+            for root_filename, (data, error) in tqdm(zip(root_filenames, results), total=len(root_filenames),
+                                                     desc="Convert root objects to tensor store."):
+                if error is not None:
+                    logger.error(f"Error on file {root_filename}: {error}")
+                    failed.append(root_filename)
+                    continue
+                if data is not None:
+                    writer.add(data, source_file=root_filename, run_number=run_numbers.get(root_filename))
+                succeeded.append(root_filename)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    logger.info(f"Packed {len(succeeded)}/{len(root_filenames)} root objects into {store_dir}, {len(failed)} failed.")
+    return {"succeeded": succeeded, "failed": failed}
+
 
-            np.savez_compressed(
-                os.path.join(dest_folder, root_filename.replace(".root", ".npz")),
-                data=data
-            )
-            
 if __name__ == "__main__": 
     root_files_folder = "/Users/zetasourpi/Desktop/GitRepoQC/AIQualityControl/data-ingestion/bad"
+    if len(sys.argv) > 1:
+        root_files_folder = sys.argv[1] # python utils.py <folder of .root files>
     convert_root_files_to_tensors(root_files_folder, os.path.join(root_files_folder, 'tensors'))
-    
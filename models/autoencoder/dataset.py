@@ -1,4 +1,6 @@
 import os 
+import sys
+from pathlib import Path
 from torch.utils.data import Dataset
 from torchvision import transforms
 from utils import *
@@ -6,6 +8,10 @@ from PIL import Image
 from typing import Optional, Tuple, List
 from matplotlib.image import imread
 
+# the tensor store format lives with the ingestion code; appended, so the local utils still wins
+sys.path.append(str(Path(__file__).resolve().parents[2] / "data-ingestion"))
+from tensor_store import TensorStoreReader
+
 
 class QcdbImageDataset(Dataset):
     def __init__(self, folder, limit=None, image_size=None):
@@ -80,7 +86,31 @@ class QcdbNpyTensorDataset(Dataset):
         # t_in = torch.cat([t_norm,scale_map], dim=0)  # (2, H, W)
         
         return t
-        
+
+
+class QcdbTensorStoreDataset(Dataset):
+    """
+    Samples of the sharded store written by data-ingestion/tensor_store.py, read
+    through its TensorStoreReader (np.memmap views into the shards, nothing is
+    decompressed and the reads are sequential).
+    """
+    def __init__(self, store_dir: str, limit: Optional[int] = None):
+        self.reader = TensorStoreReader(store_dir)
+        self.n = len(self.reader) if limit is None else min(limit, len(self.reader))
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, idx: int) -> torch.Tensor:
+        if not 0 <= idx < self.n:
+            raise IndexError(idx)
+        data = self.reader[idx]
+
+        x = np.log1p(data[0])/14 # same scaling as QcdbNpyTensorDataset
+
+        return torch.from_numpy(x).unsqueeze(0) # (1, H, W) tensor
+
+
 class QcdbNpyFakeTensorDataset(Dataset):
     def __init__(
         self,